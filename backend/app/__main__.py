@@ -6,4 +6,6 @@ if __name__ == "__main__":
     # uvicorn app.main:app --reload --app-dir backend
     import uvicorn
 
-    uvicorn.run(app, host="127.0.0.1", port=8000)
+    # Keep the queue-based logging set up by app.main; the access log comes from
+    # AccessLogMiddleware
+    uvicorn.run(app, host="127.0.0.1", port=8000, log_config=None, access_log=False)
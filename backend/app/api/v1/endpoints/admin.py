@@ -0,0 +1,48 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends
+
+from app.core.compression import ENCODERS, compression_stats
+from app.core.logging import dropped_log_records
+from app.core.security import require_admin
+from app.db.cache import connection_cache
+from app.services.analytics import cohort_stats, refresh_all
+from app.services.sessions import session_activity
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.get("/cache")
+async def cache_stats() -> dict[str, Any]:
+    """Connection cache hit ratio and memory held (this worker only)."""
+    return connection_cache.stats()
+
+
+@router.get("/compression")
+async def get_compression_stats() -> dict[str, Any]:
+    """Response compression totals: bytes before/after and encoder CPU time (this worker only)."""
+    return {"encodings": list(ENCODERS), **compression_stats.as_dict()}
+
+
+@router.get("/logging")
+async def logging_stats() -> dict[str, int]:
+    """Log records dropped because the queue was full (this worker only)."""
+    return {"dropped_records": dropped_log_records()}
+
+
+@router.get("/sessions")
+async def session_stats() -> dict[str, Any]:
+    """Buffered session activity awaiting flush, and total writes flushed (this worker only)."""
+    return session_activity.stats()
+
+
+@router.get("/analytics")
+async def get_analytics() -> dict[str, Any]:
+    """Cross-user cohort stats, served from the materialized aggregate."""
+    return await cohort_stats()
+
+
+@router.post("/analytics/refresh")
+async def refresh_analytics() -> dict[str, float]:
+    """Rebuild the materialized aggregates from scratch; returns stage timings."""
+    return await refresh_all()
@@ -5,10 +5,12 @@ from uuid import uuid4
 from bson import ObjectId
 from fastapi import APIRouter, HTTPException, status, Response, Cookie, Depends
 from pydantic import BaseModel, EmailStr, Field, field_validator
+from pymongo.errors import DuplicateKeyError
 
 from app.core.config import settings
-from app.core.security import hash_password, verify_password, get_current_user
+from app.core.security import hash_password, verify_password, get_current_user, set_session_cookie
 from app.db.mongo import get_users_collection, get_sessions_collection
+from app.services.sessions import session_activity
 
 router = APIRouter()
 
@@ -53,14 +55,6 @@ async def register(data: RegisterRequest):
     """Register a new user."""
     users = get_users_collection()
     
-    # Check if user already exists
-    existing = await users.find_one({"email": data.email})
-    if existing:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
-        )
-    
     # Create user document
     user_doc = {
         "email": data.email,
@@ -71,7 +65,14 @@ async def register(data: RegisterRequest):
         "budget_limit": 3000,  # default
     }
     
-    await users.insert_one(user_doc)
+    # The unique email index rejects duplicates atomically, so no lookup is needed first
+    try:
+        await users.insert_one(user_doc)
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
     return {"message": "User registered successfully"}
 
 
@@ -104,20 +105,14 @@ async def login(data: LoginRequest, response: Response):
         "session_id": session_id,
         "user_id": user["_id"],
         "created_at": datetime.now(timezone.utc),
+        "last_seen": datetime.now(timezone.utc),
         "expires_at": expires_at,
     }
     
     await sessions.insert_one(session_doc)
     
     # Set HttpOnly cookie
-    response.set_cookie(
-        key="session_id",
-        value=session_id,
-        httponly=True,
-        samesite="lax",
-        secure=settings.env != "local",  # Secure in production
-        max_age=settings.session_exp_minutes * 60,
-    )
+    set_session_cookie(response, session_id)
     
     return {"message": "Login successful"}
 
@@ -126,6 +121,8 @@ async def login(data: LoginRequest, response: Response):
 async def logout(response: Response, session_id: str | None = Cookie(default=None)):
     """Logout and clear session cookie."""
     if session_id:
+        # Drop buffered activity so a pending flush can't outlive the logout
+        session_activity.discard(session_id)
         sessions = get_sessions_collection()
         await sessions.delete_one({"session_id": session_id})
     
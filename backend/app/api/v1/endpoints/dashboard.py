@@ -1,10 +1,17 @@
-from typing import Any
+from datetime import datetime
+from typing import Any, Literal
+from uuid import uuid4
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from pydantic import BaseModel, Field
+from pymongo import ReturnDocument
 
 from app.core.security import get_current_user
+from app.db.cache import connection_cache
+from app.db.columnar import load_transactions, transactions_total
 from app.db.mongo import get_connections_collection, get_users_collection
+from app.db.rollups import query_rollups
+from app.services.analytics import record_budget_change
 
 router = APIRouter()
 
@@ -33,6 +40,15 @@ class TransactionItem(BaseModel):
     amount: float
 
 
+class SpendingBucket(BaseModel):
+    bucket_start: datetime
+    sum: float
+    count: int
+    min: float
+    max: float
+    categories: dict[str, float]
+
+
 class CategoryItem(BaseModel):
     name: str
     amount: float
@@ -40,6 +56,7 @@ class CategoryItem(BaseModel):
 
 
 class GoalItem(BaseModel):
+    id: str
     name: str
     date: str
     monthly: float
@@ -53,6 +70,13 @@ class GoalCreateRequest(BaseModel):
     total: float = Field(gt=0, le=100000000, description="Total target amount")
 
 
+class GoalUpdateRequest(BaseModel):
+    name: str | None = Field(default=None, min_length=1, max_length=100)
+    date: str | None = Field(default=None, min_length=1)
+    monthly: float | None = Field(default=None, gt=0, le=1000000)
+    total: float | None = Field(default=None, gt=0, le=100000000)
+
+
 class MessageResponse(BaseModel):
     message: str
 
@@ -62,14 +86,12 @@ class MessageResponse(BaseModel):
 @router.get("/budget", response_model=BudgetResponse)
 async def get_budget(user: dict[str, Any] = Depends(get_current_user)):
     """Get user's budget info."""
-    connections = get_connections_collection()
-    
     # Calculate spent from transactions
-    connection = await connections.find_one({"user_id": user["_id"]})
+    connection = await connection_cache.get(user["_id"])
     
     spent = 0.0
-    if connection and connection.get("transactions"):
-        spent = sum(t.get("amount", 0) for t in connection["transactions"])
+    if connection:
+        spent = transactions_total(connection)
     
     return {
         "spent": spent,
@@ -84,7 +106,6 @@ async def update_budget(
 ):
     """Update user's budget limit."""
     users = get_users_collection()
-    connections = get_connections_collection()
     
     await users.update_one(
         {"_id": user["_id"]},
@@ -92,10 +113,12 @@ async def update_budget(
     )
     
     # Calculate spent from transactions
-    connection = await connections.find_one({"user_id": user["_id"]})
+    connection = await connection_cache.get(user["_id"])
     spent = 0.0
-    if connection and connection.get("transactions"):
-        spent = sum(t.get("amount", 0) for t in connection["transactions"])
+    if connection:
+        spent = transactions_total(connection)
+    
+    await record_budget_change(user["_id"], data.limit)
     
     return {
         "spent": spent,
@@ -106,9 +129,7 @@ async def update_budget(
 @router.get("/subscriptions", response_model=list[SubscriptionItem])
 async def get_subscriptions(user: dict[str, Any] = Depends(get_current_user)):
     """Get user's subscriptions."""
-    connections = get_connections_collection()
-    
-    connection = await connections.find_one({"user_id": user["_id"]})
+    connection = await connection_cache.get(user["_id"])
     
     if not connection or not connection.get("connected"):
         return []
@@ -117,24 +138,46 @@ async def get_subscriptions(user: dict[str, Any] = Depends(get_current_user)):
 
 
 @router.get("/spending/daily", response_model=list[TransactionItem])
-async def get_daily_spending(user: dict[str, Any] = Depends(get_current_user)):
-    """Get user's daily transactions."""
-    connections = get_connections_collection()
+async def get_daily_spending(
+    offset: int = Query(default=0, ge=0),
+    limit: int | None = Query(default=None, ge=1),
+    user: dict[str, Any] = Depends(get_current_user),
+):
+    """Get user's daily transactions (optionally one page of them)."""
+    connection = await connection_cache.get(user["_id"])
     
-    connection = await connections.find_one({"user_id": user["_id"]})
+    if not connection or not connection.get("connected"):
+        return []
+    
+    # Only the requested page is decoded when history is stored columnar
+    transactions = load_transactions(connection)
+    end = None if limit is None else offset + limit
+    return transactions[offset:end]
+
+
+@router.get("/spending/rollups", response_model=list[SpendingBucket])
+async def get_spending_rollups(
+    granularity: Literal["daily", "weekly", "monthly"] = "daily",
+    start: datetime | None = Query(default=None, description="Inclusive lower bound (ISO 8601)"),
+    end: datetime | None = Query(default=None, description="Exclusive upper bound (ISO 8601)"),
+    user: dict[str, Any] = Depends(get_current_user),
+):
+    """Get user's pre-aggregated spending buckets for a date range."""
+    # Uncached: the generation must be current, older generations are being deleted
+    connection = await get_connections_collection().find_one(
+        {"user_id": user["_id"]}, projection={"connected": 1, "generation": 1}
+    )
     
     if not connection or not connection.get("connected"):
         return []
     
-    return connection.get("transactions", [])
+    return await query_rollups(user["_id"], connection.get("generation", 0), granularity, start, end)
 
 
 @router.get("/spending/categories", response_model=list[CategoryItem])
 async def get_spending_categories(user: dict[str, Any] = Depends(get_current_user)):
     """Get user's spending categories breakdown."""
-    connections = get_connections_collection()
-    
-    connection = await connections.find_one({"user_id": user["_id"]})
+    connection = await connection_cache.get(user["_id"])
     
     if not connection or not connection.get("connected"):
         return []
@@ -145,9 +188,7 @@ async def get_spending_categories(user: dict[str, Any] = Depends(get_current_use
 @router.get("/goals", response_model=list[GoalItem])
 async def get_goals(user: dict[str, Any] = Depends(get_current_user)):
     """Get user's savings goals."""
-    connections = get_connections_collection()
-    
-    connection = await connections.find_one({"user_id": user["_id"]})
+    connection = await connection_cache.get(user["_id"])
     
     if not connection or not connection.get("connected"):
         return []
@@ -163,30 +204,84 @@ async def create_goal(
     """Add a new savings goal."""
     connections = get_connections_collection()
     
-    # Ensure connection exists
-    connection = await connections.find_one({"user_id": user["_id"]})
-    if not connection:
-        # Create connection without Plaid but allow goals
-        await connections.insert_one({
-            "user_id": user["_id"],
-            "connected": False,
-            "connected_at": None,
-            "subscriptions": [],
-            "transactions": [],
-            "spending_categories": [],
-            "goals": [],
-        })
-    
     goal = {
+        "id": str(uuid4()),
         "name": data.name,
         "date": data.date,
         "monthly": data.monthly,
         "total": data.total,
     }
     
+    # Single upsert: creates the connection (without Plaid) on first goal, else appends
     await connections.update_one(
         {"user_id": user["_id"]},
-        {"$push": {"goals": goal}}
+        {
+            "$setOnInsert": {
+                "connected": False,
+                "connected_at": None,
+                "subscriptions": [],
+                "transactions": [],
+                "spending_categories": [],
+            },
+            "$push": {"goals": goal},
+        },
+        upsert=True,
     )
+    connection_cache.invalidate(user["_id"])
     
     return goal
+
+
+@router.patch("/goals/{goal_id}", response_model=GoalItem)
+async def update_goal(
+    goal_id: str,
+    data: GoalUpdateRequest,
+    user: dict[str, Any] = Depends(get_current_user)
+):
+    """Edit fields of one savings goal."""
+    connections = get_connections_collection()
+    
+    changes = data.model_dump(exclude_none=True)
+    if not changes:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No fields to update"
+        )
+    
+    # Positional $set touches only the matched goal; projection returns only that goal
+    connection = await connections.find_one_and_update(
+        {"user_id": user["_id"], "goals.id": goal_id},
+        {"$set": {f"goals.$.{field}": value for field, value in changes.items()}},
+        projection={"_id": 0, "goals.$": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    connection_cache.invalidate(user["_id"])
+    if not connection:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Goal not found"
+        )
+    
+    return connection["goals"][0]
+
+
+@router.delete("/goals/{goal_id}", response_model=MessageResponse)
+async def delete_goal(
+    goal_id: str,
+    user: dict[str, Any] = Depends(get_current_user)
+):
+    """Remove one savings goal."""
+    connections = get_connections_collection()
+    
+    result = await connections.update_one(
+        {"user_id": user["_id"], "goals.id": goal_id},
+        {"$pull": {"goals": {"id": goal_id}}}
+    )
+    connection_cache.invalidate(user["_id"])
+    if result.matched_count == 0:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Goal not found"
+        )
+    
+    return {"message": "Goal deleted"}
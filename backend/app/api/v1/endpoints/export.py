@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import csv
+import io
+from typing import Any, AsyncIterator, Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+
+from app.core.security import get_current_user
+from app.db.columnar import COLUMNAR_FIELD
+from app.db.mongo import get_connections_collection
+
+router = APIRouter()
+
+EXPORT_COLUMNS = ["record_type", "name", "icon", "amount", "date", "monthly", "total"]
+
+# Rows per Mongo batch, CSV write and Parquet row group
+CHUNK_ROWS = 1000
+
+
+def _rows_pipeline(user_id: Any) -> list[dict[str, Any]]:
+    """Unwind a user's transactions and goals into one flat row per record, server-side."""
+    # Columnar-stored history is decoded row by row in the same pipeline
+    col = f"${COLUMNAR_FIELD}"
+    return [
+        {"$match": {"user_id": user_id, "connected": True}},
+        {
+            "$project": {
+                "_id": 0,
+                "rows": {
+                    "$concatArrays": [
+                        {
+                            "$map": {
+                                "input": {"$ifNull": ["$transactions", []]},
+                                "as": "t",
+                                "in": {
+                                    "record_type": "transaction",
+                                    "name": "$$t.name",
+                                    "icon": "$$t.icon",
+                                    "amount": "$$t.amount",
+                                },
+                            }
+                        },
+                        {
+                            "$map": {
+                                "input": {"$range": [0, {"$size": {"$ifNull": [f"{col}.amount_cents", []]}}]},
+                                "as": "i",
+                                "in": {
+                                    "record_type": "transaction",
+                                    "name": {
+                                        "$arrayElemAt": [
+                                            f"{col}.names",
+                                            {"$arrayElemAt": [f"{col}.name_ids", "$$i"]},
+                                        ]
+                                    },
+                                    "icon": {
+                                        "$arrayElemAt": [
+                                            f"{col}.icons",
+                                            {"$arrayElemAt": [f"{col}.icon_ids", "$$i"]},
+                                        ]
+                                    },
+                                    "amount": {
+                                        "$divide": [{"$arrayElemAt": [f"{col}.amount_cents", "$$i"]}, 100]
+                                    },
+                                },
+                            }
+                        },
+                        {
+                            "$map": {
+                                "input": {"$ifNull": ["$goals", []]},
+                                "as": "g",
+                                "in": {
+                                    "record_type": "goal",
+                                    "name": "$$g.name",
+                                    "date": "$$g.date",
+                                    "monthly": "$$g.monthly",
+                                    "total": "$$g.total",
+                                },
+                            }
+                        },
+                    ]
+                },
+            }
+        },
+        {"$unwind": "$rows"},
+        {"$replaceRoot": {"newRoot": "$rows"}},
+    ]
+
+
+async def _row_chunks(user_id: Any) -> AsyncIterator[list[dict[str, Any]]]:
+    """Yield rows in CHUNK_ROWS batches; the cursor only fetches the next batch when asked."""
+    cursor = get_connections_collection().aggregate(_rows_pipeline(user_id), batchSize=CHUNK_ROWS)
+    chunk: list[dict[str, Any]] = []
+    async for row in cursor:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_ROWS:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def _csv_stream(user_id: Any) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, extrasaction="ignore")
+    writer.writeheader()
+    yield buffer.getvalue().encode("utf-8")
+
+    async for chunk in _row_chunks(user_id):
+        buffer.seek(0)
+        buffer.truncate(0)
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Write-only sink that hands out bytes as they are produced. It keeps the absolute
+    position for tell(), which the Parquet writer needs for footer offsets.
+    """
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def _parquet_stream(user_id: Any) -> AsyncIterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema(
+        [
+            ("record_type", pa.string()),
+            ("name", pa.string()),
+            ("icon", pa.string()),
+            ("amount", pa.float64()),
+            ("date", pa.string()),
+            ("monthly", pa.float64()),
+            ("total", pa.float64()),
+        ]
+    )
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        async for chunk in _row_chunks(user_id):
+            # One row group per chunk
+            writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+@router.get("/export")
+async def export_data(
+    export_format: Literal["csv", "parquet"] = Query(default="csv", alias="format"),
+    user: dict[str, Any] = Depends(get_current_user),
+):
+    """Stream the user's transactions and goals as CSV or Parquet."""
+    if export_format == "parquet":
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise HTTPException(
+                status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                detail="Parquet export requires pyarrow to be installed"
+            )
+        body = _parquet_stream(user["_id"])
+        media_type = "application/vnd.apache.parquet"
+    else:
+        body = _csv_stream(user["_id"])
+        media_type = "text/csv; charset=utf-8"
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="finfancy-export.{export_format}"'},
+    )
@@ -2,12 +2,20 @@ from __future__ import annotations
 
 from datetime import datetime, timezone
 from typing import Any
+from uuid import uuid4
 
 from fastapi import APIRouter, Depends
 from pydantic import BaseModel
+from pymongo import ReturnDocument
 
+from app.core.config import settings
 from app.core.security import get_current_user
+from app.db.cache import connection_cache
+from app.db.columnar import COLUMNAR_FIELD, encode_transactions
 from app.db.mongo import get_connections_collection
+from app.db.rollups import clear_rollups, record_transactions
+from app.services.analytics import record_user_stats
+from app.services.transaction_search import transaction_search
 
 router = APIRouter()
 
@@ -272,9 +280,36 @@ SCENARIOS: list[dict[str, Any]] = [
 ]
 
 
-def _next_scenario_index(current_index: int | None) -> int:
-    base = -1 if current_index is None else int(current_index)
-    return (base + 1) % len(SCENARIOS)
+def _encode_scenario(scenario: dict[str, Any]) -> dict[str, Any]:
+    """A scenario's connection fields in the configured transaction encoding."""
+    fields = {
+        "scenario_name": scenario["name"],
+        "subscriptions": scenario["subscriptions"],
+        "transactions": scenario["transactions"],
+        COLUMNAR_FIELD: None,
+        "spending_categories": scenario["spending_categories"],
+        "goals": scenario["goals"],
+    }
+    if settings.transaction_storage == "columnar":
+        fields["transactions"] = []
+        # Missing timestamps stay None here and are filled with connected_at per connect
+        fields[COLUMNAR_FIELD] = encode_transactions(scenario["transactions"], None)
+    return fields
+
+
+# Encoded once; only goal ids and default timestamps vary per connect
+_ENCODED_SCENARIOS = [_encode_scenario(scenario) for scenario in SCENARIOS]
+
+
+def _scenario_fields(index: int, connected_at: datetime) -> dict[str, Any]:
+    """The ``$set`` for one scenario: fresh goal ids, timestamps defaulted to ``connected_at``."""
+    fields = dict(_ENCODED_SCENARIOS[index])
+    fields["goals"] = [{"id": str(uuid4()), **goal} for goal in fields["goals"]]
+    columns = fields[COLUMNAR_FIELD]
+    if columns is not None:
+        epoch = int(connected_at.timestamp())
+        fields[COLUMNAR_FIELD] = {**columns, "ts": [epoch if ts is None else ts for ts in columns["ts"]]}
+    return fields
 
 
 class MessageResponse(BaseModel):
@@ -290,27 +325,63 @@ async def plaid_connect(user: dict[str, Any] = Depends(get_current_user)):
     """Simulate a Plaid connection and seed demo data (cycles scenarios per user)."""
     connections = get_connections_collection()
 
-    existing = await connections.find_one({"user_id": user["_id"]})
-    current_index = existing.get("scenario_index") if existing else None
-    scenario_index = _next_scenario_index(current_index)
-    scenario = SCENARIOS[scenario_index]
-
-    await connections.update_one(
+    # Two writes, not one atomic step: cycling in the same update would mean sending every
+    # scenario with each request. $inc hands every concurrent connect its own cycle
+    # position and rollup generation.
+    counters = await connections.find_one_and_update(
         {"user_id": user["_id"]},
+        {"$inc": {"connects": 1, "generation": 1}},
+        projection={"connects": 1, "generation": 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    scenario_index = (counters["connects"] - 1) % len(SCENARIOS)
+    generation = counters["generation"]
+
+    # Only the chosen scenario is sent; if a later connect/disconnect already bumped the
+    # generation, its write stands and this one matches nothing
+    connected_at = datetime.now(timezone.utc)
+    try:
+        result = await connections.update_one(
+            {"user_id": user["_id"], "generation": generation},
+            {
+                "$set": {
+                    "connected": True,
+                    "connected_at": connected_at,
+                    "scenario_index": scenario_index,
+                    **_scenario_fields(scenario_index, connected_at),
+                }
+            },
+        )
+    except Exception:
+        # Undo the counters so /spending/rollups keeps serving the previous generation
+        # (no buckets exist for this one). Skipped if the $set landed after all, or a
+        # newer connect/disconnect has moved on.
+        await connections.update_one(
+            {"user_id": user["_id"], "generation": generation, "connected_at": {"$ne": connected_at}},
+            {"$inc": {"connects": -1, "generation": -1}},
+        )
+        raise
+    connection_cache.invalidate(user["_id"])
+    transaction_search.invalidate(user["_id"])
+    if result.matched_count == 0:
+        # Superseded mid-request; the newer connect/disconnect rebuilds the derived data
+        return {"message": "Bank connected successfully"}
+
+    # Transaction history was replaced wholesale: build this generation's rollups, then drop older ones
+    scenario = SCENARIOS[scenario_index]
+    await record_transactions(user["_id"], scenario["transactions"], at=connected_at, generation=generation)
+    await clear_rollups(user["_id"], before_generation=generation)
+    await record_user_stats(
+        user["_id"],
         {
-            "$set": {
-                "user_id": user["_id"],
-                "connected": True,
-                "connected_at": datetime.now(timezone.utc),
-                "scenario_index": scenario_index,
-                "scenario_name": scenario["name"],
-                "subscriptions": scenario["subscriptions"],
-                "transactions": scenario["transactions"],
-                "spending_categories": scenario["spending_categories"],
-                "goals": scenario["goals"],
-            }
+            "connected": True,
+            "transactions": scenario["transactions"],
+            "spending_categories": scenario["spending_categories"],
+            "goals": scenario["goals"],
         },
-        upsert=True,
+        user.get("budget_limit", 3000),
+        generation=generation,
     )
 
     return {"message": "Bank connected successfully"}
@@ -319,8 +390,7 @@ async def plaid_connect(user: dict[str, Any] = Depends(get_current_user)):
 @router.get("/status", response_model=PlaidStatusResponse)
 async def plaid_status(user: dict[str, Any] = Depends(get_current_user)):
     """Get mock Plaid connection status."""
-    connections = get_connections_collection()
-    connection = await connections.find_one({"user_id": user["_id"]})
+    connection = await connection_cache.get(user["_id"])
     return {"connected": bool(connection and connection.get("connected"))}
 
 
@@ -329,19 +399,29 @@ async def plaid_disconnect(user: dict[str, Any] = Depends(get_current_user)):
     """Disconnect from Plaid and clear demo data."""
     connections = get_connections_collection()
 
-    await connections.update_one(
+    connection = await connections.find_one_and_update(
         {"user_id": user["_id"]},
         {
+            "$inc": {"generation": 1},
             "$set": {
                 "connected": False,
                 "connected_at": None,
                 "subscriptions": [],
                 "transactions": [],
+                COLUMNAR_FIELD: None,
                 "spending_categories": [],
                 "goals": [],
             }
         },
+        projection={"generation": 1},
         upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    connection_cache.invalidate(user["_id"])
+    transaction_search.invalidate(user["_id"])
+    await clear_rollups(user["_id"], before_generation=connection["generation"])
+    await record_user_stats(
+        user["_id"], {"connected": False}, user.get("budget_limit", 3000), generation=connection["generation"]
     )
 
     return {"message": "Bank disconnected"}
@@ -0,0 +1,20 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends, Query
+
+from app.api.v1.endpoints.dashboard import TransactionItem
+from app.core.security import get_current_user
+from app.services.transaction_search import transaction_search
+
+router = APIRouter()
+
+
+@router.get("/search", response_model=list[TransactionItem])
+async def search_transactions(
+    q: str = Query(min_length=1, max_length=100, description="Merchant name prefix or approximate spelling"),
+    limit: int = Query(default=10, ge=1, le=50),
+    user: dict[str, Any] = Depends(get_current_user),
+):
+    """Typeahead search over the user's transactions by merchant name."""
+    index = await transaction_search.get(user["_id"])
+    return index.search(q, limit)
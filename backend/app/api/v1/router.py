@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.v1.endpoints import health, auth, plaid, dashboard
+from app.api.v1.endpoints import admin, health, auth, plaid, dashboard, export, transactions
 
 api_router = APIRouter()
 
@@ -15,3 +15,12 @@ api_router.include_router(plaid.router, prefix="/plaid", tags=["plaid"])
 
 # Dashboard APIs
 api_router.include_router(dashboard.router, tags=["dashboard"])
+
+# Transaction search / typeahead
+api_router.include_router(transactions.router, prefix="/transactions", tags=["transactions"])
+
+# Data export (CSV / Parquet)
+api_router.include_router(export.router, tags=["export"])
+
+# Operational endpoints (X-Admin-Token)
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import asyncio
+import gzip
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.logging import bind_request_context
+
+try:  # optional
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+try:  # optional
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "image/svg+xml",
+    "text/",
+)
+
+# (idle level, loaded level) per encoding
+_LEVELS = {"zstd": (6, 1), "br": (5, 1), "gzip": (6, 1)}
+
+
+def _zstd_compress(data: bytes, level: int) -> bytes:
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+def _brotli_compress(data: bytes, level: int) -> bytes:
+    return brotli.compress(data, quality=level)
+
+
+def _gzip_compress(data: bytes, level: int) -> bytes:
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+# Server preference order, used to break ties between equal client q-values
+ENCODERS: dict[str, Callable[[bytes, int], bytes]] = {}
+if zstandard is not None:
+    ENCODERS["zstd"] = _zstd_compress
+if brotli is not None:
+    ENCODERS["br"] = _brotli_compress
+ENCODERS["gzip"] = _gzip_compress
+
+
+def negotiate(accept_encoding: str) -> str | None:
+    """Pick the best supported encoding from an Accept-Encoding header, or None."""
+    weights: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        key, _, value = params.partition("=")
+        if key.strip().lower() == "q":
+            try:
+                q = float(value.strip())
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+
+    best, best_q = None, 0.0
+    for encoding in ENCODERS:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+@dataclass
+class CompressionStats:
+    responses: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    cpu_seconds: float = 0.0
+    offloaded: int = 0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "responses": self.responses,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "ratio": self.bytes_out / self.bytes_in if self.bytes_in else None,
+            "cpu_seconds": self.cpu_seconds,
+            "offloaded_to_thread": self.offloaded,
+        }
+
+
+compression_stats = CompressionStats()
+
+
+class _LoadGauge:
+    """1-minute load average per CPU, re-read at most once a second."""
+
+    def __init__(self) -> None:
+        self._cpus = os.cpu_count() or 1
+        self._value = 0.0
+        self._read_at = 0.0
+
+    def busy(self, threshold: float = 0.75) -> bool:
+        now = time.monotonic()
+        if now - self._read_at > 1:
+            self._read_at = now
+            try:
+                self._value = os.getloadavg()[0] / self._cpus
+            except (AttributeError, OSError):  # not available on Windows
+                self._value = 0.0
+        return self._value >= threshold
+
+
+def _compress(encoding: str, data: bytes, level: int) -> tuple[bytes, float]:
+    started = time.thread_time()
+    body = ENCODERS[encoding](data, level)
+    return body, time.thread_time() - started
+
+
+class CompressionMiddleware:
+    """
+    Compresses complete (non-streaming) 200 responses of compressible types once they
+    reach ``minimum_size``, using zstd, br or gzip as negotiated. The level drops
+    when the host is loaded. Bodies of ``thread_threshold`` bytes or more are
+    compressed in a worker thread so the event loop keeps serving.
+
+    Each response gets a ``Server-Timing: compress`` header with encoder CPU time and
+    byte counts; the same figures go to the access log and ``compression_stats``.
+    """
+
+    def __init__(self, app: ASGIApp, *, minimum_size: int = 1024, thread_threshold: int = 64 * 1024) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.thread_threshold = thread_threshold
+        self.load = _LoadGauge()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = None
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                encoding = negotiate(value.decode("latin-1"))
+                break
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Message | None = None
+        passthrough = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                if (
+                    # Partial (206) and other non-200 bodies must go out byte-for-byte
+                    message["status"] != 200
+                    or "content-range" in headers
+                    or "content-encoding" in headers
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                ):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start = message
+                return
+
+            body = message.get("body", b"")
+            if message.get("more_body", False) or len(body) < self.minimum_size:
+                # Streaming or small: send as-is
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            await self._send_compressed(start, body, encoding, send)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _send_compressed(self, start: Message, body: bytes, encoding: str, send: Send) -> None:
+        idle_level, loaded_level = _LEVELS[encoding]
+        level = loaded_level if self.load.busy() else idle_level
+
+        if len(body) >= self.thread_threshold:
+            compressed, cpu = await asyncio.to_thread(_compress, encoding, body, level)
+            compression_stats.offloaded += 1
+        else:
+            compressed, cpu = _compress(encoding, body, level)
+
+        compression_stats.responses += 1
+        compression_stats.bytes_in += len(body)
+        compression_stats.bytes_out += len(compressed)
+        compression_stats.cpu_seconds += cpu
+        bind_request_context(
+            encoding=encoding, bytes_in=len(body), bytes_out=len(compressed), compress_ms=round(cpu * 1000, 3)
+        )
+
+        headers = MutableHeaders(raw=start["headers"])
+        headers["content-encoding"] = encoding
+        headers["content-length"] = str(len(compressed))
+        # The encoded bytes differ, so a strong validator no longer applies
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["etag"] = f"W/{etag}"
+        headers.add_vary_header("Accept-Encoding")
+        headers.append(
+            "server-timing",
+            f'compress;dur={cpu * 1000:.3f};desc="{encoding} {len(body)}->{len(compressed)}"',
+        )
+        await send(start)
+        await send({"type": "http.response.body", "body": compressed, "more_body": False})
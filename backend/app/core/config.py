@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from typing import Literal
+
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -16,16 +18,80 @@ class Settings(BaseSettings):
 
     # Session expiry (in minutes) - default 24 hours
     session_exp_minutes: int = Field(default=60 * 24, alias="SESSION_EXP_MINUTES")
+    # Sliding expiry: activity is buffered and flushed to Mongo on this interval
+    session_flush_interval_seconds: float = Field(default=30.0, gt=0, alias="SESSION_FLUSH_INTERVAL_SECONDS")
+    # Extend a session (and re-issue its cookie) only when expiry would move by at least this much
+    session_extend_granularity_seconds: float = Field(default=300.0, ge=0, alias="SESSION_EXTEND_GRANULARITY_SECONDS")
 
     app_name: str = Field(default="SpartaHacks-11 API", alias="APP_NAME")
     env: str = Field(default="local", alias="ENV")
     log_level: str = Field(default="INFO", alias="LOG_LEVEL")
+    # "json" (structured) or "text"
+    log_format: str = Field(default="json", alias="LOG_FORMAT")
+    # Records beyond this many pending writes are dropped rather than blocking requests
+    log_queue_size: int = Field(default=10000, ge=1, alias="LOG_QUEUE_SIZE")
+    # Comma-separated logger=keep_rate pairs (e.g. "app.access=0.1")
+    log_sample_rates: str = Field(default="", alias="LOG_SAMPLE_RATES")
 
     api_v1_str: str = Field(default="/api/v1", alias="API_V1_STR")
 
+    # How transaction history is stored on the connection document:
+    # "documents" = array of {name, icon, amount}, "columnar" = dictionary-encoded parallel arrays
+    transaction_storage: Literal["documents", "columnar"] = Field(
+        default="documents", alias="TRANSACTION_STORAGE"
+    )
+
     # Comma-separated string (e.g. "http://localhost:3000,http://127.0.0.1:3000")
     # Kept as a string to avoid JSON parsing requirements for lists in .env.
     allowed_origins: str = Field(default="", alias="ALLOWED_ORIGINS")
 
+    # Opt-in request profiling: requests carrying X-Profile-Token=<token>, or a random
+    # sample of requests, are profiled. Both unset/0 means the middleware isn't installed.
+    profile_token: str = Field(default="", alias="PROFILE_TOKEN")
+    profile_sample_rate: float = Field(default=0.0, ge=0.0, le=1.0, alias="PROFILE_SAMPLE_RATE")
+    profile_dir: str = Field(default="profiles", alias="PROFILE_DIR")
+    profile_max_files: int = Field(default=50, ge=1, alias="PROFILE_MAX_FILES")
+    profile_interval_ms: float = Field(default=1.0, gt=0, alias="PROFILE_INTERVAL_MS")
+    profile_top_n: int = Field(default=25, ge=1, alias="PROFILE_TOP_N")
+
+    # Background budget-alert evaluator
+    budget_alerts_enabled: bool = Field(default=True, alias="BUDGET_ALERTS_ENABLED")
+    budget_alerts_interval_seconds: int = Field(default=900, ge=1, alias="BUDGET_ALERTS_INTERVAL_SECONDS")
+    budget_alerts_chunk_size: int = Field(default=1000, ge=1, alias="BUDGET_ALERTS_CHUNK_SIZE")
+    budget_alerts_concurrency: int = Field(default=4, ge=1, alias="BUDGET_ALERTS_CONCURRENCY")
+
+    # Rate limiting / admission control.
+    # rate_limits: comma-separated "path=requests_per_second/burst", applied per client IP
+    # and per session. max_concurrent_requests: in-flight cap before 503s (0 = no cap).
+    rate_limit_enabled: bool = Field(default=True, alias="RATE_LIMIT_ENABLED")
+    rate_limits: str = Field(
+        default="/api/v1/auth/login=0.2/5,/api/v1/auth/register=0.1/3,/api/v1/plaid/connect=0.5/5",
+        alias="RATE_LIMITS",
+    )
+    max_concurrent_requests: int = Field(default=512, ge=0, alias="MAX_CONCURRENT_REQUESTS")
+    # "memory" (per worker) or "sqlite" (shared by all workers on the host)
+    rate_limit_backend: Literal["memory", "sqlite"] = Field(default="memory", alias="RATE_LIMIT_BACKEND")
+    rate_limit_sqlite_path: str = Field(default="ratelimit.sqlite3", alias="RATE_LIMIT_SQLITE_PATH")
+
+    # Per-worker read-through cache of connection documents
+    connection_cache_max_bytes: int = Field(default=64 * 1024 * 1024, ge=0, alias="CONNECTION_CACHE_MAX_BYTES")
+    # Upper bound on staleness from writes handled by other workers
+    connection_cache_ttl_seconds: float = Field(default=30.0, ge=0, alias="CONNECTION_CACHE_TTL_SECONDS")
+
+    # Per-worker transaction search indexes, rebuilt when the connection's generation changes
+    transaction_search_max_bytes: int = Field(default=256 * 1024 * 1024, ge=0, alias="TRANSACTION_SEARCH_MAX_BYTES")
+
+    # Full $merge rebuild of the cross-user analytics (0 = only incremental updates)
+    analytics_refresh_interval_seconds: int = Field(default=3600, ge=0, alias="ANALYTICS_REFRESH_INTERVAL_SECONDS")
+
+    # Response compression (zstd/br need the optional zstandard/brotli packages; gzip always works)
+    compression_enabled: bool = Field(default=True, alias="COMPRESSION_ENABLED")
+    compression_min_size: int = Field(default=1024, ge=0, alias="COMPRESSION_MIN_SIZE")
+    # Bodies at least this large are compressed in a worker thread
+    compression_thread_threshold: int = Field(default=64 * 1024, ge=0, alias="COMPRESSION_THREAD_THRESHOLD")
+
+    # Shared secret for /admin endpoints (sent as X-Admin-Token); empty disables them
+    admin_token: str = Field(default="", alias="ADMIN_TOKEN")
+
 
 settings = Settings()
@@ -1,12 +1,234 @@
 from __future__ import annotations
 
+import hashlib
+import json
 import logging
+import queue
+import copy
+import random
 import sys
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any
 
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-def configure_logging(level: str = "INFO") -> None:
-    logging.basicConfig(
-        level=getattr(logging, level.upper(), logging.INFO),
-        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
-        handlers=[logging.StreamHandler(sys.stdout)],
-    )
+ACCESS_LOGGER = "app.access"
+
+# Per-request fields (route, user) attached to every record logged while handling it
+_request_context: ContextVar[dict[str, Any] | None] = ContextVar("request_context", default=None)
+
+_listener: QueueListener | None = None
+
+_UVICORN_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+# Standard LogRecord attributes; anything else on a record came from ``extra=``
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "exc"}
+
+_exc_formatter = logging.Formatter()
+
+
+def hash_user_id(user_id: Any) -> str:
+    """Stable, non-reversible user reference for logs."""
+    return hashlib.sha256(str(user_id).encode()).hexdigest()[:12]
+
+
+def bind_request_context(**fields: Any) -> None:
+    """Attach fields to the current request's log context (no-op outside a request)."""
+    context = _request_context.get()
+    if context is not None:
+        context.update(fields)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        context = getattr(record, "request", None)
+        if context:
+            entry.update(context)
+        entry.update(
+            (k, v) for k, v in vars(record).items() if k not in _RECORD_ATTRS and k != "request"
+        )
+        exc = getattr(record, "exc", None)
+        if exc is None and record.exc_info:
+            exc = self.formatException(record.exc_info)
+        if exc:
+            entry["exc"] = exc
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Plain-text lines; appends the traceback ``DroppingQueueHandler`` moved to ``exc``."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        exc = getattr(record, "exc", None)
+        return f"{line}\n{exc}" if exc else line
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of records from high-volume loggers.
+    ``rates`` maps logger names to keep-probabilities; children inherit their parent's rate.
+    Warnings and above are never sampled out.
+    """
+
+    def __init__(self, rates: dict[str, float]) -> None:
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        name = record.name
+        while name:
+            rate = self.rates.get(name)
+            if rate is not None:
+                return rate >= 1 or random.random() < rate
+            name = name.rpartition(".")[0]
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Hands records to a bounded queue drained by a background thread, so logging never
+    writes to stdout on the event loop. When the queue is full the record is dropped
+    (and counted) instead of blocking the caller.
+    """
+
+    def __init__(self, log_queue: queue.Queue) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Snapshot the request context now; the writer thread can't see this task's contextvars
+        context = _request_context.get()
+        if context:
+            record.request = dict(context)
+        if record.exc_info:
+            # QueueHandler.prepare would fold the traceback into msg and drop exc_info;
+            # keep it in its own field so formatters can emit it separately
+            record = copy.copy(record)
+            record.exc = record.exc_text or _exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+            record.exc_text = None
+        return super().prepare(record)
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _parse_sample_rates(spec: str) -> dict[str, float]:
+    rates = {}
+    for item in spec.split(","):
+        name, sep, rate = item.partition("=")
+        if sep and name.strip():
+            rates[name.strip()] = float(rate)
+    return rates
+
+
+def configure_logging(
+    level: str = "INFO",
+    fmt: str = "json",
+    queue_size: int = 10000,
+    sample_rates: str = "",
+) -> None:
+    """
+    Route all logging through a bounded queue to a background stdout writer.
+    ``sample_rates`` is a comma-separated ``logger=rate`` list, e.g. ``app.access=0.1``.
+    """
+    global _listener
+    stop_logging()
+
+    stream = logging.StreamHandler(sys.stdout)
+    if fmt == "json":
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(TextFormatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    handler.addFilter(SamplingFilter(_parse_sample_rates(sample_rates)))
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(getattr(logging, level.upper(), logging.INFO))
+
+    # uvicorn's default log_config gives its loggers synchronous stdout handlers; route
+    # them through the queue instead. Its access line duplicates AccessLogMiddleware.
+    for name in _UVICORN_LOGGERS:
+        uvicorn_logger = logging.getLogger(name)
+        for existing in uvicorn_logger.handlers[:]:
+            uvicorn_logger.removeHandler(existing)
+        uvicorn_logger.propagate = True
+    logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
+
+    _listener = QueueListener(handler.queue, stream, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the writer thread (called on app shutdown)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def dropped_log_records() -> int:
+    """Records discarded because the log queue was full (this worker only)."""
+    return sum(getattr(h, "dropped", 0) for h in logging.getLogger().handlers)
+
+
+class AccessLogMiddleware:
+    """Binds a per-request log context and emits one structured access record per request."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self.logger = logging.getLogger(ACCESS_LOGGER)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        context: dict[str, Any] = {"method": scope["method"], "path": scope["path"]}
+        token = _request_context.set(context)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Matched handler name: stable across path params and router prefixes
+            route = scope.get("route")
+            if route is not None:
+                context["route"] = getattr(route, "name", None)
+            self.logger.info(
+                "%s %s %d",
+                scope["method"],
+                scope["path"],
+                status_code,
+                extra={
+                    "status": status_code,
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                },
+            )
+            _request_context.reset(token)
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import asyncio
+import hmac
+import logging
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from uuid import uuid4
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile-token"
+
+
+class StackSampler:
+    """
+    Statistical profiler: a background thread snapshots one thread's Python stack
+    every ``interval`` seconds and counts the collapsed stacks.
+
+    The sampled thread is the event loop thread, so while one request is being
+    profiled, work interleaved from other in-flight requests shows up too.
+    """
+
+    def __init__(self, thread_id: int, interval: float) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+            self.samples += 1
+
+    def folded(self) -> str:
+        """Brendan Gregg collapsed-stack format (flamegraph.pl / speedscope / inferno)."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self, top_n: int) -> str:
+        own: Counter[str] = Counter()
+        total: Counter[str] = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for name in set(frames):
+                total[name] += count
+
+        samples = max(self.samples, 1)
+        lines = [f"{self.samples} samples @ {self.interval * 1000:.1f} ms", "", "self%   total%  function"]
+        for name, count in own.most_common(top_n):
+            lines.append(f"{100 * count / samples:6.1f}  {100 * total[name] / samples:6.1f}  {name}")
+        return "\n".join(lines) + "\n"
+
+
+class ProfilerMiddleware:
+    """
+    Profiles a request end-to-end (dependencies such as ``get_current_user`` included)
+    when it carries a valid ``X-Profile-Token`` header or is picked by sampling.
+    Output lands in ``directory`` as ``.folded`` + ``.txt`` pairs, oldest pruned first.
+
+    Only one request is profiled at a time; others pass straight through.
+    Not installed at all unless profiling is configured, so it costs nothing when off.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        token: str,
+        sample_rate: float,
+        directory: str,
+        max_files: int,
+        interval_ms: float,
+        top_n: int,
+    ) -> None:
+        self.app = app
+        self.token = token.encode()
+        self.sample_rate = sample_rate
+        self.directory = Path(directory)
+        self.max_files = max_files
+        self.interval = interval_ms / 1000
+        self.top_n = top_n
+        self._busy = threading.Lock()
+
+    def _wants_profile(self, scope: Scope) -> bool:
+        if self.token:
+            for name, value in scope["headers"]:
+                if name == PROFILE_HEADER:
+                    return hmac.compare_digest(value, self.token)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        if not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            sampler = StackSampler(threading.get_ident(), self.interval)
+            started = time.perf_counter()
+            sampler.start()
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                sampler.stop()
+                elapsed = time.perf_counter() - started
+                await asyncio.to_thread(self._write, scope, sampler, elapsed)
+        finally:
+            self._busy.release()
+
+    def _write(self, scope: Scope, sampler: StackSampler, elapsed: float) -> None:
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            slug = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_") or "root"
+            stem = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid4().hex[:8]}-{scope['method']}-{slug}"
+            header = f"{scope['method']} {scope['path']} took {elapsed * 1000:.1f} ms\n"
+            (self.directory / f"{stem}.folded").write_text(sampler.folded(), encoding="utf-8")
+            (self.directory / f"{stem}.txt").write_text(header + sampler.summary(self.top_n), encoding="utf-8")
+            self._prune()
+        except OSError:
+            logger.exception("Failed to write request profile")
+
+    def _prune(self) -> None:
+        profiles = sorted(self.directory.glob("*.folded"), key=lambda p: p.stat().st_mtime)
+        for old in profiles[: max(len(profiles) - self.max_files, 0)]:
+            old.unlink(missing_ok=True)
+            old.with_suffix(".txt").unlink(missing_ok=True)
+
@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from starlette.requests import cookie_parser
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import Settings
+
+
+class RateLimitStore(ABC):
+    """Token-bucket state backend. ``take`` is the only operation the middleware needs."""
+
+    @abstractmethod
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        """Consume one token from ``key``'s bucket; return 0 if allowed, else seconds to wait."""
+
+    def close(self) -> None:
+        pass
+
+
+def _refill(tokens: float, updated: float, now: float, rate: float, burst: float) -> float:
+    return min(burst, tokens + (now - updated) * rate)
+
+
+class MemoryRateLimitStore(RateLimitStore):
+    """
+    Per-worker buckets in sharded dicts. Updates never await, so they are atomic on
+    the event loop without locks. Every ``sweep_every`` operations one shard is swept
+    for buckets that have refilled completely, which are equivalent to absent ones.
+    """
+
+    def __init__(self, shards: int = 16, sweep_every: int = 256) -> None:
+        # bucket = [tokens, updated_at, full_at]
+        self._shards: list[dict[str, list[float]]] = [{} for _ in range(shards)]
+        self._sweep_every = sweep_every
+        self._ops = 0
+        self._next_shard = 0
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        now = time.monotonic()
+        shard = self._shards[hash(key) % len(self._shards)]
+        bucket = shard.get(key)
+        tokens = burst if bucket is None else _refill(bucket[0], bucket[1], now, rate, burst)
+
+        if tokens >= 1:
+            tokens -= 1
+            wait = 0.0
+        else:
+            wait = (1 - tokens) / rate
+        shard[key] = [tokens, now, now + (burst - tokens) / rate]
+
+        self._ops += 1
+        if self._ops % self._sweep_every == 0:
+            self._sweep(now)
+        return wait
+
+    def _sweep(self, now: float) -> None:
+        shard = self._shards[self._next_shard]
+        self._next_shard = (self._next_shard + 1) % len(self._shards)
+        for key in [k for k, b in shard.items() if b[2] <= now]:
+            del shard[key]
+
+
+class SQLiteRateLimitStore(RateLimitStore):
+    """
+    Buckets in a local SQLite file, so every worker process on the host shares limits
+    (a stand-in for a networked store such as Redis). Each take is one short
+    IMMEDIATE transaction run off the event loop.
+    """
+
+    def __init__(self, path: str, max_idle_seconds: float = 3600, sweep_every: int = 1024) -> None:
+        self._conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL)"
+        )
+        self._lock = threading.Lock()
+        self._max_idle = max_idle_seconds
+        self._sweep_every = sweep_every
+        self._ops = 0
+
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        return await asyncio.to_thread(self._take, key, rate, burst)
+
+    def _take(self, key: str, rate: float, burst: float) -> float:
+        # Wall clock: monotonic clocks aren't comparable across processes
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT tokens, updated FROM buckets WHERE key = ?", (key,)
+                ).fetchone()
+                tokens = burst if row is None else _refill(row[0], row[1], now, rate, burst)
+                if tokens >= 1:
+                    tokens -= 1
+                    wait = 0.0
+                else:
+                    wait = (1 - tokens) / rate
+                self._conn.execute(
+                    "INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                    (key, tokens, now),
+                )
+                self._ops += 1
+                if self._ops % self._sweep_every == 0:
+                    self._conn.execute("DELETE FROM buckets WHERE updated < ?", (now - self._max_idle,))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return wait
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def parse_rate_limits(spec: str) -> dict[str, tuple[float, float]]:
+    """Parse ``"/path=rate/burst,..."`` (rate in requests per second) into ``{path: (rate, burst)}``."""
+    rules = {}
+    for item in spec.split(","):
+        path, sep, limit = item.strip().partition("=")
+        if not sep:
+            continue
+        rate, _, burst = limit.partition("/")
+        rules[path.strip()] = (float(rate), float(burst or 1))
+    return rules
+
+
+class RateLimitMiddleware:
+    """
+    Admission control in front of the app:
+
+    - a global in-flight cap: excess requests get an immediate 503 + Retry-After,
+      before any routing, dependency or database work;
+    - per-route token buckets, keyed by client IP and (when present) session cookie;
+      exhausting either returns 429 + Retry-After.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        store: RateLimitStore,
+        rules: dict[str, tuple[float, float]],
+        max_concurrent: int = 0,
+    ) -> None:
+        self.app = app
+        self.store = store
+        self.rules = rules
+        self.max_concurrent = max_concurrent
+        self.in_flight = 0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if self.max_concurrent and self.in_flight >= self.max_concurrent:
+            await _reject(503, "Server busy, retry shortly", 1)(scope, receive, send)
+            return
+
+        self.in_flight += 1
+        try:
+            rule = self.rules.get(scope["path"])
+            if rule is not None:
+                wait = await self._take(scope, *rule)
+                if wait > 0:
+                    await _reject(429, "Too many requests", wait)(scope, receive, send)
+                    return
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+
+    async def _take(self, scope: Scope, rate: float, burst: float) -> float:
+        path = scope["path"]
+        client = scope.get("client")
+        wait = await self.store.take(f"ip:{client[0] if client else '-'}:{path}", rate, burst)
+
+        session_id = _session_cookie(scope)
+        if session_id:
+            wait = max(wait, await self.store.take(f"sid:{session_id}:{path}", rate, burst))
+        return wait
+
+
+def _session_cookie(scope: Scope) -> str | None:
+    for name, value in scope["headers"]:
+        if name == b"cookie":
+            return cookie_parser(value.decode("latin-1")).get("session_id")
+    return None
+
+
+def _reject(status_code: int, detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        {"detail": detail},
+        status_code=status_code,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+def build_store(settings: Settings) -> RateLimitStore:
+    if settings.rate_limit_backend == "sqlite":
+        return SQLiteRateLimitStore(settings.rate_limit_sqlite_path)
+    return MemoryRateLimitStore()
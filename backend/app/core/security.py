@@ -1,8 +1,13 @@
+import hmac
 from datetime import datetime, timezone
 from typing import Any
 
-from fastapi import Cookie, HTTPException, status
+from fastapi import Cookie, Header, HTTPException, Request, Response, status
 from passlib.context import CryptContext
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.logging import bind_request_context, hash_user_id
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -15,14 +20,64 @@ def verify_password(password: str, hashed_password: str) -> bool:
     return pwd_context.verify(password, hashed_password)
 
 
-async def get_current_user(session_id: str | None = Cookie(default=None)) -> dict[str, Any]:
+def set_session_cookie(response: Response, session_id: str) -> None:
+    """Set the HttpOnly session cookie for a full session window."""
+    response.set_cookie(
+        key="session_id",
+        value=session_id,
+        httponly=True,
+        samesite="lax",
+        secure=settings.env != "local",  # Secure in production
+        max_age=settings.session_exp_minutes * 60,
+    )
+
+
+class SessionCookieMiddleware:
+    """
+    Re-issues the session cookie when ``get_current_user`` extended the session.
+    Done here rather than on the dependency's Response, whose headers FastAPI drops
+    when an endpoint returns its own Response (e.g. the streaming export).
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Shared with request.state in the endpoint
+        state = scope.setdefault("state", {})
+
+        async def send_wrapper(message: Message) -> None:
+            session_id = state.get("refresh_session")
+            if message["type"] == "http.response.start" and session_id:
+                cookie = Response()
+                set_session_cookie(cookie, session_id)
+                set_cookie = [(k, v) for k, v in cookie.raw_headers if k == b"set-cookie"]
+                message["headers"] = [*message["headers"], *set_cookie]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+async def get_current_user(
+    request: Request, session_id: str | None = Cookie(default=None)
+) -> dict[str, Any]:
     """
     FastAPI dependency that loads the current user from session cookie.
     Returns the user document from MongoDB.
     Raises 401 if not authenticated or session expired.
+
+    Sessions slide: activity is buffered in ``session_activity`` and flushed in
+    batches, and the cookie is re-issued (by ``SessionCookieMiddleware``) whenever
+    the expiry moves forward. Expired sessions are left to the TTL index, so this
+    path never writes.
     """
     # Import here to avoid circular imports
     from app.db.mongo import get_sessions_collection, get_users_collection
+    from app.services.sessions import session_activity
     
     if not session_id:
         raise HTTPException(
@@ -41,12 +96,9 @@ async def get_current_user(session_id: str | None = Cookie(default=None)) -> dic
             detail="Invalid session"
         )
     
-    # Check expiry (MongoDB stores naive UTC datetimes)
-    expires_at = session["expires_at"]
-    if expires_at.tzinfo is None:
-        expires_at = expires_at.replace(tzinfo=timezone.utc)
-    if expires_at < datetime.now(timezone.utc):
-        await sessions.delete_one({"session_id": session_id})
+    # Check expiry, counting extensions not yet flushed; the TTL index removes the document
+    now = datetime.now(timezone.utc)
+    if session_activity.expires_at(session) < now:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Session expired"
@@ -60,4 +112,22 @@ async def get_current_user(session_id: str | None = Cookie(default=None)) -> dic
             detail="User not found"
         )
     
-    return user
\ No newline at end of file
+    if session_activity.touch(session, now) is not None:
+        request.state.refresh_session = session_id
+    
+    bind_request_context(user=hash_user_id(user["_id"]))
+    return user
+
+
+async def require_admin(x_admin_token: str | None = Header(default=None)) -> None:
+    """
+    FastAPI dependency guarding operational endpoints.
+    Raises 403 unless ADMIN_TOKEN is configured and matches the X-Admin-Token header.
+    """
+    if not settings.admin_token or not x_admin_token or not hmac.compare_digest(
+        x_admin_token.encode(), settings.admin_token.encode()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
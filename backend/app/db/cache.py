@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from functools import partial
+from typing import Any
+
+import bson
+
+from app.core.config import settings
+from app.db.mongo import get_connections_collection
+
+
+class ConnectionCache:
+    """
+    Per-worker read-through cache of ``connections`` documents keyed by user_id.
+
+    - Size-aware LRU: entries are charged their BSON size and evicted oldest-first
+      once ``max_bytes`` is exceeded; documents over 1/8 of the budget aren't cached.
+    - Single-flight: concurrent misses for one user share a single Mongo read.
+    - Writers call ``invalidate``; ``ttl_seconds`` bounds staleness from writes
+      handled by other workers.
+
+    Cached documents are shared between requests and must not be mutated.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float) -> None:
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0  # Mongo reads; misses minus loads = reads saved by single-flight
+        # user_id -> (document, size, expires_at)
+        self._entries: OrderedDict[Any, tuple[dict[str, Any] | None, int, float]] = OrderedDict()
+        self._loading: dict[Any, asyncio.Future] = {}
+
+    async def get(self, user_id: Any) -> dict[str, Any] | None:
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            if entry[2] > time.monotonic():
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            self._evict(user_id)
+
+        self.misses += 1
+        task = self._loading.get(user_id)
+        if task is None:
+            # The cache owns the load, so one caller being cancelled can't fail the others
+            task = asyncio.ensure_future(get_connections_collection().find_one({"user_id": user_id}))
+            task.add_done_callback(partial(self._loaded, user_id))
+            self._loading[user_id] = task
+            self.loads += 1
+        return await asyncio.shield(task)
+
+    def _loaded(self, user_id: Any, task: asyncio.Future) -> None:
+        # Retrieving the exception here keeps it from being reported as unhandled with no waiters
+        failed = task.cancelled() or task.exception() is not None
+        # Still ours unless invalidate() ran mid-load, in which case the result is stale
+        if self._loading.get(user_id) is not task:
+            return
+        del self._loading[user_id]
+        if not failed:
+            self._store(user_id, task.result())
+
+    def invalidate(self, user_id: Any) -> None:
+        self._evict(user_id)
+        self._loading.pop(user_id, None)
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "loads": self.loads,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _store(self, user_id: Any, doc: dict[str, Any] | None) -> None:
+        size = len(bson.encode(doc)) if doc is not None else 16
+        if size > self.max_bytes // 8:
+            return
+        self._evict(user_id)
+        self._entries[user_id] = (doc, size, time.monotonic() + self.ttl_seconds)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self.bytes -= evicted_size
+
+    def _evict(self, user_id: Any) -> None:
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+
+
+connection_cache = ConnectionCache(
+    max_bytes=settings.connection_cache_max_bytes,
+    ttl_seconds=settings.connection_cache_ttl_seconds,
+)
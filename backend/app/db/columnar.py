@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+from collections.abc import Sequence
+from datetime import datetime, timezone
+from typing import Any, overload
+
+# Connection field holding the columnar encoding (None when stored as plain subdocuments)
+COLUMNAR_FIELD = "transactions_columnar"
+
+
+def encode_transactions(
+    transactions: list[dict[str, Any]], default_ts: datetime | None
+) -> dict[str, list[Any]]:
+    """
+    Encode ``{name, icon, amount[, timestamp]}`` rows as parallel arrays:
+    dictionary-encoded merchant names and icons, amounts as integer cents and
+    timestamps as epoch seconds. Missing fields are kept as None so rows decode
+    back to the same shape.
+    """
+    names: dict[str, int] = {}
+    icons: dict[str, int] = {}
+    columns: dict[str, list[Any]] = {
+        "name_ids": [],
+        "icon_ids": [],
+        "amount_cents": [],
+        "ts": [],
+    }
+
+    for t in transactions:
+        name, icon, amount = t.get("name"), t.get("icon"), t.get("amount")
+        ts = t.get("timestamp", default_ts)
+        columns["name_ids"].append(None if name is None else names.setdefault(name, len(names)))
+        columns["icon_ids"].append(None if icon is None else icons.setdefault(icon, len(icons)))
+        columns["amount_cents"].append(None if amount is None else round(amount * 100))
+        columns["ts"].append(int(ts.timestamp()) if isinstance(ts, datetime) else ts)
+
+    columns["names"] = list(names)
+    columns["icons"] = list(icons)
+    return columns
+
+
+class ColumnarTransactions(Sequence):
+    """Read-only view over encoded columns; rows are decoded only when accessed."""
+
+    def __init__(self, columns: dict[str, list[Any]]) -> None:
+        self._columns = columns
+
+    def __len__(self) -> int:
+        return len(self._columns["amount_cents"])
+
+    @overload
+    def __getitem__(self, index: int) -> dict[str, Any]: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[dict[str, Any]]: ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._row(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self._row(index)
+
+    def _row(self, i: int) -> dict[str, Any]:
+        c = self._columns
+        row: dict[str, Any] = {}
+        if c["name_ids"][i] is not None:
+            row["name"] = c["names"][c["name_ids"][i]]
+        if c["icon_ids"][i] is not None:
+            row["icon"] = c["icons"][c["icon_ids"][i]]
+        if c["amount_cents"][i] is not None:
+            row["amount"] = c["amount_cents"][i] / 100
+        if c["ts"][i] is not None:
+            row["timestamp"] = datetime.fromtimestamp(c["ts"][i], tz=timezone.utc)
+        return row
+
+    def total_cents(self) -> int:
+        return sum(cents for cents in self._columns["amount_cents"] if cents is not None)
+
+
+def load_transactions(connection: dict[str, Any]) -> Sequence[dict[str, Any]]:
+    """A connection's transactions, whichever storage encoding it uses."""
+    columns = connection.get(COLUMNAR_FIELD)
+    if columns:
+        return ColumnarTransactions(columns)
+    return connection.get("transactions") or []
+
+
+def transactions_total(connection: dict[str, Any]) -> float:
+    """Sum of transaction amounts (exact integer-cent arithmetic for columnar storage)."""
+    transactions = load_transactions(connection)
+    if isinstance(transactions, ColumnarTransactions):
+        return transactions.total_cents() / 100
+    return sum(t.get("amount") or 0 for t in transactions)
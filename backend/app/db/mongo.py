@@ -5,6 +5,7 @@ from motor.motor_asyncio import (
     AsyncIOMotorCollection,
     AsyncIOMotorDatabase,
 )
+from pymongo.errors import OperationFailure
 
 from app.core.config import settings
 
@@ -65,6 +66,39 @@ def get_connections_collection() -> AsyncIOMotorCollection:
     return get_collection("connections")
 
 
+def get_spending_rollups_collection() -> AsyncIOMotorCollection:
+    """Convenience accessor for the pre-aggregated spending rollups collection."""
+    return get_collection("spending_rollups")
+
+
+def get_budget_alerts_collection() -> AsyncIOMotorCollection:
+    """Convenience accessor for the budget threshold alerts collection."""
+    return get_collection("budget_alerts")
+
+
+def get_analytics_user_stats_collection() -> AsyncIOMotorCollection:
+    """Convenience accessor for per-user inputs to the cross-user analytics."""
+    return get_collection("analytics_user_stats")
+
+
+def get_analytics_global_collection() -> AsyncIOMotorCollection:
+    """Convenience accessor for the materialized cross-user analytics document."""
+    return get_collection("analytics_global")
+
+
+def get_jobs_collection() -> AsyncIOMotorCollection:
+    """Convenience accessor for background job leases (one document per job)."""
+    return get_collection("jobs")
+
+
+def field_key(name: str) -> str:
+    """Make an arbitrary label (merchant, category, icon) safe to use as a document field name."""
+    key = name.replace(".", "\uff0e")
+    if key.startswith("$"):
+        key = "\uff04" + key[1:]
+    return key or "_"
+
+
 async def _ensure_indexes() -> None:
     """Create necessary indexes for collections."""
     # Users: unique email index
@@ -78,4 +112,24 @@ async def _ensure_indexes() -> None:
     
     # Connections: index on user_id for lookups
     connections = get_connections_collection()
-    await connections.create_index("user_id", unique=True)
\ No newline at end of file
+    await connections.create_index("user_id", unique=True)
+    
+    # Spending rollups: one bucket per user/generation/granularity/start, range-scanned by start
+    rollups = get_spending_rollups_collection()
+    await rollups.create_index(
+        [("user_id", 1), ("generation", 1), ("granularity", 1), ("bucket_start", 1)], unique=True
+    )
+    # The pre-generation unique index would reject a new generation's buckets
+    try:
+        await rollups.drop_index("user_id_1_granularity_1_bucket_start_1")
+    except OperationFailure:
+        pass
+    
+    # Budget alerts: one record per user/period/threshold crossing
+    alerts = get_budget_alerts_collection()
+    await alerts.create_index([("user_id", 1), ("period", 1), ("threshold", 1)], unique=True)
+    
+    # Analytics: per-user stats are upserted / $merge'd on user_id
+    user_stats = get_analytics_user_stats_collection()
+    await user_stats.create_index("user_id", unique=True)
+
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterable
+
+from pymongo import UpdateOne
+
+from app.db.mongo import field_key, get_spending_rollups_collection
+
+GRANULARITIES = ("daily", "weekly", "monthly")
+
+
+def bucket_start(ts: datetime, granularity: str) -> datetime:
+    """Start (UTC midnight) of the daily / weekly (Monday) / monthly bucket containing ``ts``."""
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    day = ts.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "daily":
+        return day
+    if granularity == "weekly":
+        return day - timedelta(days=day.weekday())
+    if granularity == "monthly":
+        return day.replace(day=1)
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+def _transaction_time(transaction: dict[str, Any], default: datetime) -> datetime:
+    ts = transaction.get("timestamp")
+    if isinstance(ts, datetime):
+        return ts
+    if isinstance(ts, (int, float)):
+        return datetime.fromtimestamp(ts, tz=timezone.utc)
+    return default
+
+
+def _transaction_category(transaction: dict[str, Any]) -> str:
+    # Transactions carry no category yet; the icon is what the dashboard groups by.
+    return field_key(transaction.get("category") or transaction.get("icon") or "other")
+
+
+async def record_transactions(
+    user_id: Any,
+    transactions: Iterable[dict[str, Any]],
+    at: datetime | None = None,
+    generation: int = 0,
+) -> None:
+    """
+    Fold newly written transactions into the user's rollup buckets for ``generation``.
+    Transactions are pre-aggregated per bucket locally, then applied with one
+    bulk upsert of $inc/$min/$max, so concurrent writers never lose updates.
+    Transactions without a timestamp are bucketed at ``at`` (default: now).
+
+    ``generation`` is the connection's counter, bumped by every connect/disconnect.
+    Rebuilds write a fresh generation instead of clearing and refilling in place, so
+    racing connects never mix their buckets; readers only see the current one.
+    """
+    default_ts = at or datetime.now(timezone.utc)
+    buckets: dict[tuple[str, datetime], dict[str, Any]] = {}
+
+    for t in transactions:
+        amount = t.get("amount")
+        if amount is None:
+            continue
+        ts = _transaction_time(t, default_ts)
+        category = _transaction_category(t)
+        for granularity in GRANULARITIES:
+            key = (granularity, bucket_start(ts, granularity))
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = {
+                    "sum": 0.0, "count": 0, "min": amount, "max": amount, "categories": {},
+                }
+            bucket["sum"] += amount
+            bucket["count"] += 1
+            bucket["min"] = min(bucket["min"], amount)
+            bucket["max"] = max(bucket["max"], amount)
+            bucket["categories"][category] = bucket["categories"].get(category, 0) + amount
+
+    if not buckets:
+        return
+
+    ops = []
+    for (granularity, start), bucket in buckets.items():
+        inc = {"sum": bucket["sum"], "count": bucket["count"]}
+        inc.update({f"categories.{k}": v for k, v in bucket["categories"].items()})
+        ops.append(
+            UpdateOne(
+                {"user_id": user_id, "generation": generation, "granularity": granularity, "bucket_start": start},
+                {"$inc": inc, "$min": {"min": bucket["min"]}, "$max": {"max": bucket["max"]}},
+                upsert=True,
+            )
+        )
+
+    await get_spending_rollups_collection().bulk_write(ops, ordered=False)
+
+
+async def clear_rollups(user_id: Any, before_generation: int) -> None:
+    """Drop a user's buckets from generations older than ``before_generation`` (and untagged ones)."""
+    await get_spending_rollups_collection().delete_many(
+        {"user_id": user_id, "generation": {"$not": {"$gte": before_generation}}}
+    )
+
+
+async def query_rollups(
+    user_id: Any,
+    generation: int,
+    granularity: str,
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> list[dict[str, Any]]:
+    """Return the user's buckets for ``granularity`` with ``start <= bucket_start < end``, oldest first."""
+    # Generation 0 also covers buckets written before generations existed
+    query: dict[str, Any] = {
+        "user_id": user_id,
+        "generation": generation if generation else {"$in": [0, None]},
+        "granularity": granularity,
+    }
+    bounds: dict[str, datetime] = {}
+    if start is not None:
+        bounds["$gte"] = bucket_start(start, granularity)
+    if end is not None:
+        bounds["$lt"] = end
+    if bounds:
+        query["bucket_start"] = bounds
+
+    cursor = get_spending_rollups_collection().find(
+        query, projection={"_id": 0, "user_id": 0, "generation": 0, "granularity": 0}
+    ).sort("bucket_start", 1)
+    return await cursor.to_list(length=None)
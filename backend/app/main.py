@@ -8,15 +8,54 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 
 from app.api.v1.router import api_router
+from app.core.compression import CompressionMiddleware
 from app.core.config import settings
+from app.core.logging import AccessLogMiddleware, configure_logging, stop_logging
+from app.core.profiling import ProfilerMiddleware
+from app.core.ratelimit import RateLimitMiddleware, build_store, parse_rate_limits
+from app.core.security import SessionCookieMiddleware
 from app.db.mongo import close_db, connect_db
+from app.services.analytics import AnalyticsRefreshJob
+from app.services.budget_alerts import BudgetAlertJob
+from app.services.sessions import session_activity
+
+
+configure_logging(
+    settings.log_level,
+    fmt=settings.log_format,
+    queue_size=settings.log_queue_size,
+    sample_rates=settings.log_sample_rates,
+)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await connect_db()
+    session_activity.start()
+
+    budget_alerts = BudgetAlertJob(
+        interval_seconds=settings.budget_alerts_interval_seconds,
+        chunk_size=settings.budget_alerts_chunk_size,
+        concurrency=settings.budget_alerts_concurrency,
+    )
+    if settings.budget_alerts_enabled:
+        budget_alerts.start()
+    app.state.budget_alerts = budget_alerts
+
+    analytics_refresh = AnalyticsRefreshJob(interval_seconds=settings.analytics_refresh_interval_seconds)
+    if settings.analytics_refresh_interval_seconds > 0:
+        analytics_refresh.start()
+    app.state.analytics_refresh = analytics_refresh
+
     yield
+
+    await analytics_refresh.stop()
+    await budget_alerts.stop()
+    await session_activity.stop()  # final flush of buffered session activity
     await close_db()
+    if rate_limit_store is not None:
+        rate_limit_store.close()
+    stop_logging()
 
 
 app = FastAPI(
@@ -24,7 +63,33 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
-# CORS (needed if you ever serve frontend separately; harmless otherwise)
+# Re-issues the cookie of sessions extended by get_current_user (sliding expiry)
+app.add_middleware(SessionCookieMiddleware)
+
+# Opt-in per-request profiler (not installed unless configured -> zero overhead when off)
+if settings.profile_token or settings.profile_sample_rate > 0:
+    app.add_middleware(
+        ProfilerMiddleware,
+        token=settings.profile_token,
+        sample_rate=settings.profile_sample_rate,
+        directory=settings.profile_dir,
+        max_files=settings.profile_max_files,
+        interval_ms=settings.profile_interval_ms,
+        top_n=settings.profile_top_n,
+    )
+
+# Rate limits + global concurrency cap (rejections still pass through the access log)
+rate_limit_store = build_store(settings) if settings.rate_limit_enabled else None
+if rate_limit_store is not None:
+    app.add_middleware(
+        RateLimitMiddleware,
+        store=rate_limit_store,
+        rules=parse_rate_limits(settings.rate_limits),
+        max_concurrent=settings.max_concurrent_requests,
+    )
+
+# CORS (needed if you ever serve frontend separately; harmless otherwise).
+# Added after the rate limiter so 429/503 rejections also carry CORS headers.
 origins = [o.strip() for o in settings.allowed_origins.split(",") if o.strip()]
 if origins:
     app.add_middleware(
@@ -35,6 +100,17 @@ if origins:
         allow_headers=["*"],
     )
 
+# Negotiated gzip/br/zstd; inside the access log so it can record bytes and CPU cost
+if settings.compression_enabled:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression_min_size,
+        thread_threshold=settings.compression_thread_threshold,
+    )
+
+# Structured access log (route, user hash, duration) for every request
+app.add_middleware(AccessLogMiddleware)
+
 # API routes must be registered before the static mount
 app.include_router(api_router, prefix=settings.api_v1_str)
 
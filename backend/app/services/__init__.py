@@ -0,0 +1 @@
+"""Background services (scheduled jobs) started from the app lifespan."""
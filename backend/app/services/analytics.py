@@ -0,0 +1,480 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.db.columnar import COLUMNAR_FIELD, transactions_total
+from app.db.mongo import (
+    field_key,
+    get_analytics_global_collection,
+    get_analytics_user_stats_collection,
+    get_connections_collection,
+)
+from app.services.leases import acquire_lease
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_ID = "global"
+LEASE_NAME = "analytics_refresh"
+DEFAULT_BUDGET_LIMIT = 3000
+
+# Budget utilization histogram: 5%-wide buckets, the last one holds everything >= 200%
+UTILIZATION_BUCKETS = 40
+BUCKETS_PER_UNIT = 20
+
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+
+# ----- Per-user stats (incremental path) -----
+
+def _utilization_bucket(spent: float, limit: float) -> int:
+    ratio = spent / limit if limit > 0 else (2.0 if spent > 0 else 0.0)
+    return max(0, min(UTILIZATION_BUCKETS, int(ratio * BUCKETS_PER_UNIT)))
+
+
+def _goal_on_track(goal: dict[str, Any], now: datetime) -> bool:
+    """A goal is on track if its monthly contribution reaches the total by its target month."""
+    try:
+        target = datetime.strptime(goal.get("date") or "", "%b %Y")
+    except ValueError:
+        return False
+    months_left = max(0, (target.year - now.year) * 12 + target.month - now.month)
+    return (goal.get("monthly") or 0) * months_left >= (goal.get("total") or 0)
+
+
+def user_stats(
+    user_id: Any, connection: dict[str, Any] | None, budget_limit: float, now: datetime
+) -> dict[str, Any]:
+    """The per-user inputs to the cohort stats; mirrors ``_user_stats_pipeline``."""
+    connection = connection or {}
+    spent = transactions_total(connection)
+    goals = connection.get("goals") or []
+    return {
+        "user_id": user_id,
+        "connected": connection.get("connected") is True,
+        "budget_limit": budget_limit,
+        "spent": spent,
+        "utilization_bucket": _utilization_bucket(spent, budget_limit),
+        "categories": [
+            {"name": c.get("name"), "amount": c.get("amount") or 0}
+            for c in connection.get("spending_categories") or []
+        ],
+        "goals": len(goals),
+        "goals_on_track": sum(_goal_on_track(g, now) for g in goals),
+    }
+
+
+def _contribution(stats: dict[str, Any] | None) -> dict[str, float]:
+    """What one user adds to the global document, as flat ``$inc`` paths."""
+    if not stats or not stats.get("connected"):
+        return {}
+
+    category_sums: dict[str, float] = defaultdict(float)
+    for category in stats["categories"]:
+        if isinstance(category.get("name"), str):
+            category_sums[field_key(category["name"])] += category["amount"]
+
+    contribution = {
+        "users": 1,
+        "spent_sum": stats["spent"],
+        "goals": stats["goals"],
+        "goals_on_track": stats["goals_on_track"],
+        f"utilization_hist.{int(stats['utilization_bucket'])}": 1,
+    }
+    for key, amount in category_sums.items():
+        contribution[f"categories.{key}.sum"] = amount
+        contribution[f"categories.{key}.users"] = 1
+    return contribution
+
+
+async def record_user_stats(
+    user_id: Any,
+    connection: dict[str, Any] | None,
+    budget_limit: float,
+    generation: int | None = None,
+) -> None:
+    """
+    Swap in the user's new stats and apply the difference to the global document with
+    one $inc. The atomic swap hands back exactly the stats being replaced, so
+    concurrent updates for the same user still net out correctly.
+
+    With the connection ``generation``, stats from a connect/disconnect that finishes
+    after a newer one are dropped instead of replacing the newer stats.
+    """
+    new = user_stats(user_id, connection, budget_limit, datetime.now(timezone.utc))
+    query: dict[str, Any] = {"user_id": user_id}
+    if generation is not None:
+        new["generation"] = generation
+        query["generation"] = {"$not": {"$gt": generation}}
+    try:
+        old = await get_analytics_user_stats_collection().find_one_and_replace(
+            query,
+            new,
+            projection={"_id": 0},
+            upsert=True,
+            return_document=ReturnDocument.BEFORE,
+        )
+    except DuplicateKeyError:
+        # Newer stats are stored (the upsert collided on the unique user_id)
+        return
+
+    before, after = _contribution(old), _contribution(new)
+    delta = {k: after.get(k, 0) - before.get(k, 0) for k in before.keys() | after.keys()}
+    delta = {k: v for k, v in delta.items() if v}
+    if delta:
+        await get_analytics_global_collection().update_one(
+            {"_id": GLOBAL_ID},
+            {"$inc": delta, "$currentDate": {"updated_at": True}},
+            upsert=True,
+        )
+
+
+async def record_budget_change(user_id: Any, budget_limit: float) -> None:
+    """
+    Apply a budget change without touching the connection-derived stats: only
+    ``budget_limit`` and ``utilization_bucket`` are rewritten, from the stored ``spent``,
+    so a stale cached connection can't clobber them. Users without stats are left to
+    the next full refresh.
+    """
+    ratio = {
+        "$cond": [
+            {"$gt": [budget_limit, 0]},
+            {"$divide": ["$spent", budget_limit]},
+            {"$cond": [{"$gt": ["$spent", 0]}, 2, 0]},
+        ]
+    }
+    old = await get_analytics_user_stats_collection().find_one_and_update(
+        {"user_id": user_id},
+        [{"$set": {"budget_limit": budget_limit, "utilization_bucket": _utilization_bucket_expr(ratio)}}],
+        projection={"_id": 0, "connected": 1, "spent": 1, "utilization_bucket": 1},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if not old or not old.get("connected"):
+        return
+
+    # Same arithmetic as the server-side expression, so this is the bucket just written
+    bucket = _utilization_bucket(old["spent"], budget_limit)
+    old_bucket = int(old["utilization_bucket"])
+    if bucket != old_bucket:
+        await get_analytics_global_collection().update_one(
+            {"_id": GLOBAL_ID},
+            {
+                "$inc": {
+                    f"utilization_hist.{old_bucket}": -1,
+                    f"utilization_hist.{bucket}": 1,
+                },
+                "$currentDate": {"updated_at": True},
+            },
+            upsert=True,
+        )
+
+
+# ----- Full rebuild (periodic path) -----
+
+def _field_key_expr(name: Any) -> dict[str, Any]:
+    """Aggregation equivalent of ``field_key``."""
+    return {
+        "$let": {
+            "vars": {"k": {"$replaceAll": {"input": name, "find": ".", "replacement": "\uff0e"}}},
+            "in": {
+                "$cond": [
+                    {"$eq": [{"$substrCP": ["$$k", 0, 1]}, {"$literal": "$"}]},
+                    {"$concat": ["\uff04", {"$substrCP": ["$$k", 1, {"$strLenCP": "$$k"}]}]},
+                    "$$k",
+                ]
+            },
+        }
+    }
+
+
+def _goal_on_track_expr() -> dict[str, Any]:
+    """Aggregation equivalent of ``_goal_on_track`` for ``$$g``."""
+    date = {"$ifNull": ["$$g.date", ""]}
+    return {
+        "$let": {
+            "vars": {
+                "month": {"$indexOfArray": [MONTHS, {"$substrCP": [date, 0, 3]}]},
+                "year": {
+                    "$convert": {"input": {"$substrCP": [date, 4, 4]}, "to": "int", "onError": None, "onNull": None}
+                },
+            },
+            "in": {
+                "$and": [
+                    {"$gte": ["$$month", 0]},
+                    {"$ne": ["$$year", None]},
+                    {
+                        "$gte": [
+                            {
+                                "$multiply": [
+                                    {"$ifNull": ["$$g.monthly", 0]},
+                                    {
+                                        "$max": [
+                                            0,
+                                            {
+                                                "$add": [
+                                                    {"$multiply": [{"$subtract": ["$$year", {"$year": "$$NOW"}]}, 12]},
+                                                    {"$subtract": [{"$add": ["$$month", 1]}, {"$month": "$$NOW"}]},
+                                                ]
+                                            },
+                                        ]
+                                    },
+                                ]
+                            },
+                            {"$ifNull": ["$$g.total", 0]},
+                        ]
+                    },
+                ]
+            },
+        }
+    }
+
+
+def _utilization_bucket_expr(ratio: Any) -> dict[str, Any]:
+    """Aggregation equivalent of ``_utilization_bucket`` for a ratio expression."""
+    # $toInt: $floor yields a double, which would key the histogram as "17.0"
+    return {
+        "$toInt": {"$max": [0, {"$min": [UTILIZATION_BUCKETS, {"$floor": {"$multiply": [ratio, BUCKETS_PER_UNIT]}}]}]}
+    }
+
+
+def _user_stats_pipeline() -> list[dict[str, Any]]:
+    ratio = {
+        "$cond": [
+            {"$gt": ["$budget_limit", 0]},
+            {"$divide": ["$spent", "$budget_limit"]},
+            {"$cond": [{"$gt": ["$spent", 0]}, 2, 0]},
+        ]
+    }
+    return [
+        {
+            "$lookup": {
+                "from": "users",
+                "localField": "user_id",
+                "foreignField": "_id",
+                "pipeline": [{"$project": {"_id": 0, "budget_limit": 1}}],
+                "as": "user",
+            }
+        },
+        {
+            "$set": {
+                "budget_limit": {"$ifNull": [{"$first": "$user.budget_limit"}, DEFAULT_BUDGET_LIMIT]},
+                "spent": {
+                    "$add": [
+                        {"$sum": "$transactions.amount"},
+                        {"$divide": [{"$sum": f"${COLUMNAR_FIELD}.amount_cents"}, 100]},
+                    ]
+                },
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "user_id": 1,
+                # Kept so record_user_stats can still reject writes from an older connect
+                "generation": {"$ifNull": ["$generation", 0]},
+                "connected": {"$eq": ["$connected", True]},
+                "budget_limit": 1,
+                "spent": 1,
+                "utilization_bucket": _utilization_bucket_expr(ratio),
+                "categories": {
+                    "$map": {
+                        "input": {"$ifNull": ["$spending_categories", []]},
+                        "as": "c",
+                        "in": {"name": "$$c.name", "amount": {"$ifNull": ["$$c.amount", 0]}},
+                    }
+                },
+                "goals": {"$size": {"$ifNull": ["$goals", []]}},
+                "goals_on_track": {
+                    "$size": {
+                        "$filter": {
+                            "input": {"$ifNull": ["$goals", []]},
+                            "as": "g",
+                            "cond": _goal_on_track_expr(),
+                        }
+                    }
+                },
+            }
+        },
+        {
+            "$merge": {
+                "into": get_analytics_user_stats_collection().name,
+                "on": "user_id",
+                "whenMatched": "replace",
+                "whenNotMatched": "insert",
+            }
+        },
+    ]
+
+
+def _global_pipeline() -> list[dict[str, Any]]:
+    return [
+        {"$match": {"connected": True}},
+        {
+            "$facet": {
+                "totals": [
+                    {
+                        "$group": {
+                            "_id": None,
+                            "users": {"$sum": 1},
+                            "spent_sum": {"$sum": "$spent"},
+                            "goals": {"$sum": "$goals"},
+                            "goals_on_track": {"$sum": "$goals_on_track"},
+                        }
+                    }
+                ],
+                "categories": [
+                    {"$unwind": "$categories"},
+                    {"$match": {"categories.name": {"$type": "string"}}},
+                    {
+                        "$group": {
+                            "_id": {"user": "$user_id", "key": _field_key_expr("$categories.name")},
+                            "amount": {"$sum": "$categories.amount"},
+                        }
+                    },
+                    {"$group": {"_id": "$_id.key", "sum": {"$sum": "$amount"}, "users": {"$sum": 1}}},
+                ],
+                "hist": [{"$group": {"_id": "$utilization_bucket", "count": {"$sum": 1}}}],
+            }
+        },
+        {
+            "$project": {
+                "_id": {"$literal": GLOBAL_ID},
+                "users": {"$ifNull": [{"$first": "$totals.users"}, 0]},
+                "spent_sum": {"$ifNull": [{"$first": "$totals.spent_sum"}, 0]},
+                "goals": {"$ifNull": [{"$first": "$totals.goals"}, 0]},
+                "goals_on_track": {"$ifNull": [{"$first": "$totals.goals_on_track"}, 0]},
+                "categories": {
+                    "$arrayToObject": {
+                        "$map": {
+                            "input": "$categories",
+                            "as": "c",
+                            "in": {"k": "$$c._id", "v": {"sum": "$$c.sum", "users": "$$c.users"}},
+                        }
+                    }
+                },
+                "utilization_hist": {
+                    "$arrayToObject": {
+                        "$map": {
+                            "input": "$hist",
+                            "as": "h",
+                            "in": {"k": {"$toString": "$$h._id"}, "v": "$$h.count"},
+                        }
+                    }
+                },
+                "updated_at": "$$NOW",
+            }
+        },
+        {
+            "$merge": {
+                "into": get_analytics_global_collection().name,
+                "on": "_id",
+                "whenMatched": "replace",
+                "whenNotMatched": "insert",
+            }
+        },
+    ]
+
+
+async def refresh_all() -> dict[str, float]:
+    """
+    Rebuild per-user stats from ``connections`` and then the global document, both
+    server-side with $merge. Corrects any drift in the incremental path, e.g. goal
+    edits or goals whose target month has passed. Returns stage timings.
+
+    The two paths are not serialized. An incremental update whose user-stats swap and
+    global $inc straddle the global stage is either dropped (swap after the stage read
+    user stats, $inc before its replace) or counted twice (the reverse). The drift is
+    limited to updates overlapping ``global_seconds``, which is reported, and is
+    repaired by the next refresh.
+    """
+    started = time.perf_counter()
+    await get_connections_collection().aggregate(_user_stats_pipeline()).to_list(length=None)
+    user_stats_seconds = time.perf_counter() - started
+
+    await get_analytics_user_stats_collection().aggregate(_global_pipeline()).to_list(length=None)
+    total_seconds = time.perf_counter() - started
+
+    timings = {
+        "user_stats_seconds": user_stats_seconds,
+        "global_seconds": total_seconds - user_stats_seconds,
+        "total_seconds": total_seconds,
+    }
+    logger.info("Analytics refresh: %s", timings)
+    return timings
+
+
+# ----- Reads -----
+
+def _histogram_median(hist: dict[str, int], users: int) -> float | None:
+    if users <= 0:
+        return None
+    seen = 0
+    for bucket in range(UTILIZATION_BUCKETS + 1):
+        seen += hist.get(str(bucket), 0)
+        if seen * 2 >= users:
+            if bucket == UTILIZATION_BUCKETS:
+                return UTILIZATION_BUCKETS / BUCKETS_PER_UNIT
+            return (bucket + 0.5) / BUCKETS_PER_UNIT
+    return None
+
+
+async def cohort_stats() -> dict[str, Any]:
+    """Read the materialized document: one find_one plus O(categories + buckets) work."""
+    doc = await get_analytics_global_collection().find_one({"_id": GLOBAL_ID}) or {}
+    users = doc.get("users", 0)
+    goals = doc.get("goals", 0)
+    return {
+        "users": users,
+        "avg_spend": doc.get("spent_sum", 0) / users if users else None,
+        "avg_spend_by_category": {
+            name: c["sum"] / c["users"]
+            for name, c in doc.get("categories", {}).items()
+            if c.get("users")
+        },
+        "median_budget_utilization": _histogram_median(doc.get("utilization_hist", {}), users),
+        "goal_on_track_rate": doc.get("goals_on_track", 0) / goals if goals else None,
+        "updated_at": doc.get("updated_at"),
+    }
+
+
+@dataclass
+class AnalyticsRefreshJob:
+    """Runs ``refresh_all`` every ``interval_seconds``."""
+
+    interval_seconds: int
+    last_timings: dict[str, float] | None = None
+    _task: asyncio.Task | None = field(default=None, init=False, repr=False)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run_forever(), name="analytics-refresh")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                # One rebuild per interval across all workers
+                if await acquire_lease(LEASE_NAME, self.interval_seconds):
+                    self.last_timings = await refresh_all()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Analytics refresh failed")
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator
+
+from pymongo import UpdateOne
+
+from app.db.columnar import COLUMNAR_FIELD
+from app.db.mongo import (
+    get_budget_alerts_collection,
+    get_connections_collection,
+    get_users_collection,
+)
+from app.services.leases import acquire_lease
+
+logger = logging.getLogger(__name__)
+
+# Fractions of budget_limit that raise an alert (once per user per month)
+THRESHOLDS = (0.8, 1.0)
+DEFAULT_BUDGET_LIMIT = 3000
+LEASE_NAME = "budget_alerts"
+
+
+@dataclass
+class CycleMetrics:
+    started_at: datetime
+    users: int = 0
+    chunks: int = 0
+    alerts: int = 0
+    duration_seconds: float = 0.0
+    slowest_chunk_seconds: float = 0.0
+    errors: int = 0
+
+
+@dataclass
+class BudgetAlertJob:
+    """
+    Periodically evaluates every user's spend against ``budget_limit``.
+
+    Users are streamed by ``_id`` in chunks; each chunk costs one aggregation over
+    ``connections`` plus one unordered bulk upsert into ``budget_alerts``, with up to
+    ``concurrency`` chunks in flight. Crossings are keyed by (user, month, threshold)
+    and written with $setOnInsert, so each crossing is recorded exactly once.
+    """
+
+    interval_seconds: int
+    chunk_size: int
+    concurrency: int
+    last_metrics: CycleMetrics | None = None
+    _task: asyncio.Task | None = field(default=None, init=False, repr=False)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run_forever(), name="budget-alerts")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run_forever(self) -> None:
+        while True:
+            try:
+                # Every worker runs this loop; the lease lets only one of them evaluate per interval
+                if await acquire_lease(LEASE_NAME, self.interval_seconds):
+                    await self.run_cycle()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Budget alert cycle failed")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def run_cycle(self) -> CycleMetrics:
+        metrics = CycleMetrics(started_at=datetime.now(timezone.utc))
+        period = metrics.started_at.strftime("%Y-%m")
+        started = time.perf_counter()
+
+        slots = asyncio.Semaphore(self.concurrency)
+        in_flight: set[asyncio.Task] = set()
+
+        async def evaluate(users: list[dict[str, Any]]) -> None:
+            chunk_started = time.perf_counter()
+            try:
+                metrics.alerts += await self._evaluate_chunk(users, period, metrics.started_at)
+            except Exception:
+                metrics.errors += 1
+                logger.exception("Budget alert chunk failed")
+            finally:
+                metrics.slowest_chunk_seconds = max(
+                    metrics.slowest_chunk_seconds, time.perf_counter() - chunk_started
+                )
+                slots.release()
+
+        try:
+            async for users in self._user_chunks():
+                await slots.acquire()
+                metrics.users += len(users)
+                metrics.chunks += 1
+                task = asyncio.create_task(evaluate(users))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+            if in_flight:
+                await asyncio.gather(*in_flight)
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+        metrics.duration_seconds = time.perf_counter() - started
+        self.last_metrics = metrics
+        logger.info(
+            "Budget alert cycle: %d users in %d chunks, %d new alerts, %d errors, "
+            "%.2fs total, slowest chunk %.3fs",
+            metrics.users,
+            metrics.chunks,
+            metrics.alerts,
+            metrics.errors,
+            metrics.duration_seconds,
+            metrics.slowest_chunk_seconds,
+        )
+        return metrics
+
+    async def _user_chunks(self) -> AsyncIterator[list[dict[str, Any]]]:
+        cursor = (
+            get_users_collection()
+            .find({}, projection={"budget_limit": 1})
+            .sort("_id", 1)
+            .batch_size(self.chunk_size)
+        )
+        chunk: list[dict[str, Any]] = []
+        async for user in cursor:
+            chunk.append(user)
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    async def _evaluate_chunk(
+        self, users: list[dict[str, Any]], period: str, now: datetime
+    ) -> int:
+        """Return the number of newly recorded threshold crossings for this chunk."""
+        spent_by_user: dict[Any, float] = {}
+        cursor = get_connections_collection().aggregate(
+            [
+                {"$match": {"user_id": {"$in": [u["_id"] for u in users]}, "connected": True}},
+                {
+                    "$project": {
+                        "_id": 0,
+                        "user_id": 1,
+                        # Either encoding may hold the history; the other sums to 0
+                        "spent": {
+                            "$add": [
+                                {"$sum": "$transactions.amount"},
+                                {"$divide": [{"$sum": f"${COLUMNAR_FIELD}.amount_cents"}, 100]},
+                            ]
+                        },
+                    }
+                },
+            ]
+        )
+        async for row in cursor:
+            spent_by_user[row["user_id"]] = row["spent"]
+
+        ops = []
+        for user in users:
+            spent = spent_by_user.get(user["_id"], 0)
+            limit = user.get("budget_limit", DEFAULT_BUDGET_LIMIT)
+            if spent <= 0:
+                continue
+            for threshold in THRESHOLDS:
+                if spent >= threshold * limit:
+                    ops.append(
+                        UpdateOne(
+                            {"user_id": user["_id"], "period": period, "threshold": threshold},
+                            {"$setOnInsert": {"spent": spent, "limit": limit, "created_at": now}},
+                            upsert=True,
+                        )
+                    )
+
+        if not ops:
+            return 0
+        result = await get_budget_alerts_collection().bulk_write(ops, ordered=False)
+        return result.upserted_count
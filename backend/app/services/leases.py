@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import os
+import socket
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+from pymongo.errors import DuplicateKeyError
+
+from app.db.mongo import get_jobs_collection
+
+# Identifies this worker process as a lease holder
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+
+
+async def acquire_lease(name: str, ttl_seconds: float) -> bool:
+    """
+    Take or renew the ``name`` lease for ``ttl_seconds``; False if another worker holds it.
+
+    One conditional upsert: it matches when the lease has expired or is already ours,
+    otherwise the insert collides on ``_id`` and the lease stays with its holder.
+    Periodic jobs take it with ``ttl_seconds`` equal to their interval, so across all
+    workers a job runs at most once per interval.
+    """
+    now = datetime.now(timezone.utc)
+    try:
+        await get_jobs_collection().update_one(
+            {"_id": name, "$or": [{"lease_until": {"$lte": now}}, {"owner": WORKER_ID}]},
+            {"$set": {"owner": WORKER_ID, "lease_until": now + timedelta(seconds=ttl_seconds)}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        return False
+    return True
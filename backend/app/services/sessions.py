@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from pymongo import UpdateOne
+
+from app.core.config import settings
+from app.db.mongo import get_sessions_collection
+
+logger = logging.getLogger(__name__)
+
+
+def _as_utc(value: datetime) -> datetime:
+    # MongoDB stores naive UTC datetimes
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+@dataclass
+class SessionActivityBuffer:
+    """
+    Write-behind tracker for sliding session expiry.
+
+    Requests only record activity in memory; every ``flush_interval_seconds`` the
+    pending ``last_seen`` / ``expires_at`` values are written in one unordered
+    ``bulk_write``. Both fields use ``$max`` so flushes from several workers merge
+    without going backwards, and there is no upsert, so a session deleted by logout
+    or the TTL index is never recreated.
+
+    A session's expiry is only pushed forward once it would move by at least
+    ``extend_granularity_seconds``, which bounds both the flushed volume and how
+    often the cookie is re-issued.
+    """
+
+    window: timedelta
+    flush_interval_seconds: float
+    extend_granularity_seconds: float
+    flushed: int = 0
+    # session_id -> [last_seen, expires_at]
+    _pending: dict[str, list[datetime]] = field(default_factory=dict, init=False, repr=False)
+    _task: asyncio.Task | None = field(default=None, init=False, repr=False)
+
+    def expires_at(self, session: dict[str, Any]) -> datetime:
+        """Effective expiry: the stored value or a not-yet-flushed extension, whichever is later."""
+        stored = _as_utc(session["expires_at"])
+        pending = self._pending.get(session["session_id"])
+        return max(stored, pending[1]) if pending else stored
+
+    def touch(self, session: dict[str, Any], now: datetime) -> datetime | None:
+        """Record activity on a live session; returns the new expiry if it was extended."""
+        session_id = session["session_id"]
+        current = self.expires_at(session)
+        extended = now + self.window
+        if (extended - current).total_seconds() < self.extend_granularity_seconds:
+            extended = None
+
+        pending = self._pending.get(session_id)
+        if pending is None:
+            self._pending[session_id] = [now, extended or current]
+        else:
+            pending[0] = now
+            if extended is not None:
+                pending[1] = extended
+        return extended
+
+    def discard(self, session_id: str) -> None:
+        self._pending.pop(session_id, None)
+
+    def stats(self) -> dict[str, Any]:
+        return {"pending": len(self._pending), "flushed": self.flushed}
+
+    async def flush(self) -> int:
+        if not self._pending:
+            return 0
+        batch, self._pending = self._pending, {}
+        ops = [
+            UpdateOne(
+                {"session_id": session_id},
+                {"$max": {"last_seen": last_seen, "expires_at": expires_at}},
+            )
+            for session_id, (last_seen, expires_at) in batch.items()
+        ]
+        try:
+            await get_sessions_collection().bulk_write(ops, ordered=False)
+        except BaseException:
+            # Keep the batch for the next attempt, merged with anything recorded meanwhile;
+            # also on cancellation, so stop()'s final flush retries it
+            for session_id, (last_seen, expires_at) in batch.items():
+                pending = self._pending.setdefault(session_id, [last_seen, expires_at])
+                pending[0] = max(pending[0], last_seen)
+                pending[1] = max(pending[1], expires_at)
+            raise
+        self.flushed += len(ops)
+        return len(ops)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run_forever(), name="session-activity-flush")
+
+    async def stop(self) -> None:
+        """Stop the flush loop and write out whatever is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Final session activity flush failed")
+
+    async def _run_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval_seconds)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Session activity flush failed")
+
+
+session_activity = SessionActivityBuffer(
+    window=timedelta(minutes=settings.session_exp_minutes),
+    flush_interval_seconds=settings.session_flush_interval_seconds,
+    extend_granularity_seconds=settings.session_extend_granularity_seconds,
+)
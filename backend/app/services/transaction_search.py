@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import asyncio
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import Counter, OrderedDict, defaultdict
+from functools import partial
+from typing import Any
+
+from app.core.config import settings
+from app.db.cache import connection_cache
+from app.db.columnar import load_transactions
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Scripts written without spaces (CJK, kana, hangul): index every suffix so any substring is a prefix
+_UNSPACED_MIN = 0x2E80
+_MAX_SUFFIXES = 32
+
+# Rough per-item costs (CPython, 64-bit) used to charge indexes against the byte budget:
+# a decoded transaction dict, and one (token, row) posting across the index structures
+_BYTES_PER_ROW = 300
+_BYTES_PER_POSTING = 110
+
+# Minimum bigram similarity (Dice coefficient) for a misspelled token to be corrected
+FUZZY_THRESHOLD = 0.5
+
+
+def normalize(text: str) -> str:
+    """Fold case, width and accents: 'Café DÉJÀ' -> 'cafe deja', 'ｶﾌｪ' -> 'カフェ'."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return unicodedata.normalize("NFKC", stripped).casefold()
+
+
+def _index_tokens(norm: str) -> set[str]:
+    tokens = set()
+    for token in _TOKEN_RE.findall(norm):
+        tokens.add(token)
+        if any(ord(c) >= _UNSPACED_MIN for c in token):
+            tokens.update(token[i:] for i in range(1, min(len(token), _MAX_SUFFIXES)))
+    return tokens
+
+
+def _bigrams(token: str) -> set[str]:
+    padded = f" {token} "
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+class TransactionIndex:
+    """
+    Immutable search index over one user's transactions.
+
+    Prefix matching uses a sorted (token, row) list, bisected per query token, so
+    typeahead cost depends on the result limit rather than the history size.
+    Query tokens that match nothing are corrected to the closest indexed token by
+    bigram similarity; that scan covers only distinct tokens, not transactions.
+    """
+
+    def __init__(self, transactions: list[dict[str, Any]]) -> None:
+        self.transactions = transactions
+        self._doc_tokens: list[tuple[str, ...]] = []
+        pairs: list[tuple[str, int]] = []
+
+        for row, transaction in enumerate(transactions):
+            tokens = _index_tokens(normalize(transaction.get("name") or ""))
+            self._doc_tokens.append(tuple(tokens))
+            pairs.extend((token, row) for token in tokens)
+
+        pairs.sort()
+        self._tokens = [token for token, _ in pairs]
+        self._rows = [row for _, row in pairs]
+
+        self._vocab = sorted(set(self._tokens))
+        self._vocab_bigram_counts: list[int] = []
+        self._vocab_bigrams: dict[str, list[int]] = defaultdict(list)
+        for i, token in enumerate(self._vocab):
+            grams = _bigrams(token)
+            self._vocab_bigram_counts.append(len(grams))
+            for gram in grams:
+                self._vocab_bigrams[gram].append(i)
+
+        self.approx_bytes = len(transactions) * _BYTES_PER_ROW + len(self._tokens) * _BYTES_PER_POSTING
+
+    def _prefix_range(self, prefix: str) -> tuple[int, int]:
+        return (
+            bisect_left(self._tokens, prefix),
+            bisect_left(self._tokens, prefix + "\U0010ffff"),
+        )
+
+    def _prefix_matches(self, query_tokens: list[str], limit: int) -> list[int]:
+        # Drive from the most selective token, check the rest against each row's tokens
+        ranges = [(self._prefix_range(t), t) for t in query_tokens]
+        ranges.sort(key=lambda item: item[0][1] - item[0][0])
+        (lo, hi), _ = ranges[0]
+        others = [t for _, t in ranges[1:]]
+
+        found: list[int] = []
+        seen: set[int] = set()
+        for row in self._rows[lo:hi]:
+            if row in seen:
+                continue
+            seen.add(row)
+            doc_tokens = self._doc_tokens[row]
+            if all(any(d.startswith(t) for d in doc_tokens) for t in others):
+                found.append(row)
+                if len(found) >= limit:
+                    break
+        return found
+
+    def _correct(self, token: str) -> str | None:
+        """Closest indexed token to a misspelled one, or None if nothing is close enough."""
+        grams = _bigrams(token)
+        overlap: Counter[int] = Counter()
+        for gram in grams:
+            overlap.update(self._vocab_bigrams.get(gram, ()))
+
+        best, best_score = None, FUZZY_THRESHOLD
+        for i, common in overlap.items():
+            score = 2 * common / (len(grams) + self._vocab_bigram_counts[i])
+            if score >= best_score:
+                best, best_score = self._vocab[i], score
+        return best
+
+    def search(self, query: str, limit: int = 10) -> list[dict[str, Any]]:
+        query_tokens = _TOKEN_RE.findall(normalize(query))
+        if not query_tokens:
+            return []
+
+        rows = self._prefix_matches(query_tokens, limit)
+        if len(rows) < limit:
+            corrected = []
+            for token in query_tokens:
+                lo, hi = self._prefix_range(token)
+                corrected.append(token if hi > lo else self._correct(token))
+            if None not in corrected and corrected != query_tokens:
+                seen = set(rows)
+                rows += [r for r in self._prefix_matches(corrected, limit) if r not in seen]
+        return [self.transactions[row] for row in rows[:limit]]
+
+
+class TransactionSearchCache:
+    """
+    Per-worker LRU of per-user indexes, built lazily on first search.
+
+    - Freshness follows the connection's ``generation`` counter (bumped by every
+      connect/disconnect), read through ``connection_cache``, so an index is rebuilt
+      only when the transactions actually changed.
+    - Single-flight: concurrent searches against a missing or outdated index share
+      one build in the thread pool.
+    - Entries are charged their approximate size against ``max_bytes``, as in
+      ``ConnectionCache``; indexes over 1/8 of it are used but not kept.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.builds = 0
+        # user_id -> (index, generation)
+        self._indexes: OrderedDict[Any, tuple[TransactionIndex, Any]] = OrderedDict()
+        # user_id -> (generation, build task)
+        self._building: dict[Any, tuple[Any, asyncio.Future]] = {}
+
+    def invalidate(self, user_id: Any) -> None:
+        self._evict(user_id)
+        self._building.pop(user_id, None)
+
+    async def get(self, user_id: Any) -> TransactionIndex:
+        connection = await connection_cache.get(user_id)
+        generation = connection.get("generation", 0) if connection else None
+
+        entry = self._indexes.get(user_id)
+        if entry is not None and entry[1] == generation:
+            self._indexes.move_to_end(user_id)
+            return entry[0]
+
+        pending = self._building.get(user_id)
+        if pending is None or pending[0] != generation:
+            transactions = []
+            if connection and connection.get("connected"):
+                transactions = list(load_transactions(connection))
+            # Owned by the cache, so one cancelled search can't fail the others
+            task = asyncio.ensure_future(asyncio.to_thread(TransactionIndex, transactions))
+            task.add_done_callback(partial(self._built, user_id, generation))
+            pending = self._building[user_id] = (generation, task)
+            self.builds += 1
+        return await asyncio.shield(pending[1])
+
+    def _built(self, user_id: Any, generation: Any, task: asyncio.Future) -> None:
+        failed = task.cancelled() or task.exception() is not None
+        # Not kept if invalidate() ran or a newer generation's build replaced this one
+        pending = self._building.get(user_id)
+        if pending is None or pending[1] is not task:
+            return
+        del self._building[user_id]
+        if not failed:
+            self._store(user_id, task.result(), generation)
+
+    def _store(self, user_id: Any, index: TransactionIndex, generation: Any) -> None:
+        if index.approx_bytes > self.max_bytes // 8:
+            return
+        self._evict(user_id)
+        self._indexes[user_id] = (index, generation)
+        self.bytes += index.approx_bytes
+        while self.bytes > self.max_bytes:
+            _, (evicted, _) = self._indexes.popitem(last=False)
+            self.bytes -= evicted.approx_bytes
+
+    def _evict(self, user_id: Any) -> None:
+        entry = self._indexes.pop(user_id, None)
+        if entry is not None:
+            self.bytes -= entry[0].approx_bytes
+
+
+transaction_search = TransactionSearchCache(max_bytes=settings.transaction_search_max_bytes)
@@ -0,0 +1,97 @@
+"""
+Measure the cost of the cross-user analytics at scale.
+
+Seeds N synthetic users (cycling through the Plaid demo scenarios) into a scratch
+database, then times the full $merge refresh, incremental per-user updates and the
+admin read. Run from backend/ with MONGODB_URI set:
+
+    python -m benchmarks.analytics_refresh --users 100000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from bson import ObjectId
+
+from app.api.v1.endpoints.plaid import SCENARIOS
+from app.core.config import settings
+from app.db import mongo
+from app.services.analytics import cohort_stats, record_user_stats, refresh_all
+
+BATCH = 5000
+
+
+async def seed(users: int) -> list[ObjectId]:
+    user_ids = [ObjectId() for _ in range(users)]
+    for start in range(0, users, BATCH):
+        batch = user_ids[start:start + BATCH]
+        await mongo.get_users_collection().insert_many(
+            [
+                {"_id": uid, "email": f"bench-{uid}@example.com", "budget_limit": 1000 + (i % 40) * 100}
+                for i, uid in enumerate(batch, start)
+            ]
+        )
+        await mongo.get_connections_collection().insert_many(
+            [
+                {
+                    "user_id": uid,
+                    "connected": i % 10 != 0,
+                    "transactions": SCENARIOS[i % len(SCENARIOS)]["transactions"],
+                    "spending_categories": SCENARIOS[i % len(SCENARIOS)]["spending_categories"],
+                    "goals": SCENARIOS[i % len(SCENARIOS)]["goals"],
+                }
+                for i, uid in enumerate(batch, start)
+            ]
+        )
+    return user_ids
+
+
+async def timed(label: str, runs: int, fn) -> None:
+    samples = []
+    for i in range(runs):
+        started = time.perf_counter()
+        await fn(i)
+        samples.append((time.perf_counter() - started) * 1000)
+    print(
+        f"{label:<28} n={runs:<5} median={statistics.median(samples):9.2f} ms  "
+        f"max={max(samples):9.2f} ms"
+    )
+
+
+async def main(users: int, keep: bool) -> None:
+    settings.db_name = f"{settings.db_name}_bench"
+    await mongo.connect_db()
+    db = mongo.get_db()
+    try:
+        started = time.perf_counter()
+        user_ids = await seed(users)
+        print(f"seeded {users} users in {time.perf_counter() - started:.1f}s")
+
+        timings = await refresh_all()
+        print(
+            f"full refresh: user stats {timings['user_stats_seconds']:.2f}s, "
+            f"global {timings['global_seconds']:.2f}s, total {timings['total_seconds']:.2f}s"
+        )
+
+        scenario = SCENARIOS[2]
+
+        async def incremental(i: int) -> None:
+            await record_user_stats(user_ids[i], {"connected": True, **scenario}, 2500)
+
+        await timed("incremental user update", min(1000, users), incremental)
+        await timed("admin cohort read", 200, lambda _: cohort_stats())
+    finally:
+        if not keep:
+            await db.client.drop_database(db.name)
+        await mongo.close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch database afterwards")
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.keep))
@@ -0,0 +1 @@
+"""One-off data migrations, run by hand before deploying the code that needs them."""
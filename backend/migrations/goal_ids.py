@@ -0,0 +1,57 @@
+"""
+Give goals stored before goal ids existed a stable id, so PATCH/DELETE
+/goals/{id} can reach them and the dashboard can validate them.
+
+Run once from backend/ with MONGODB_URI set, before deploying the goal id API:
+
+    python -m migrations.goal_ids
+
+Idempotent: re-running only touches goals that still lack an id.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from uuid import uuid4
+
+from pymongo import UpdateOne
+
+from app.db import mongo
+
+BATCH = 1000
+
+
+async def backfill_goal_ids(batch_size: int = BATCH) -> int:
+    """Assign ids to goals without one; returns the number of connections updated."""
+    connections = mongo.get_connections_collection()
+    cursor = connections.find(
+        {"goals": {"$elemMatch": {"id": {"$exists": False}}}}, projection={"goals": 1}
+    )
+    updated = 0
+    ops = []
+    async for doc in cursor:
+        goals = [goal if "id" in goal else {"id": str(uuid4()), **goal} for goal in doc["goals"]]
+        # Matching the goals we read means a concurrent edit wins; a re-run picks it up
+        ops.append(UpdateOne({"_id": doc["_id"], "goals": doc["goals"]}, {"$set": {"goals": goals}}))
+        if len(ops) >= batch_size:
+            updated += (await connections.bulk_write(ops, ordered=False)).modified_count
+            ops = []
+    if ops:
+        updated += (await connections.bulk_write(ops, ordered=False)).modified_count
+    return updated
+
+
+async def main(batch_size: int) -> None:
+    await mongo.connect_db()
+    try:
+        updated = await backfill_goal_ids(batch_size)
+        print(f"assigned goal ids in {updated} connections")
+    finally:
+        await mongo.close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=BATCH)
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size))
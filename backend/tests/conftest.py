@@ -0,0 +1,81 @@
+import os
+
+# Settings require a URI at import time; tests never connect to it
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from app.db import mongo
+from app.db.cache import connection_cache
+
+# Collection methods that each cost one round trip to Mongo
+MONGO_OPS = {
+    "aggregate", "bulk_write", "count_documents", "delete_many", "delete_one", "distinct",
+    "find", "find_one", "find_one_and_delete", "find_one_and_replace", "find_one_and_update",
+    "insert_many", "insert_one", "replace_one", "update_many", "update_one",
+}
+
+
+class CountingCollection:
+    """Wraps a mongomock collection and records every operation as (collection, method)."""
+
+    def __init__(self, collection, calls: list[tuple[str, str]]) -> None:
+        self._collection = collection
+        self._calls = calls
+
+    def __getattr__(self, name):
+        if name in MONGO_OPS:
+            self._calls.append((self._collection.name, name))
+        return getattr(self._collection, name)
+
+    async def bulk_write(self, requests, ordered=True):
+        # mongomock can't build pymongo>=4.9 write models, so apply them one by one
+        self._calls.append((self._collection.name, "bulk_write"))
+        for request in requests:
+            await self._collection.update_one(request._filter, request._doc, upsert=request._upsert)
+
+    async def find_one_and_update(self, filter, update, projection=None, **kwargs):
+        # mongomock lacks positional projection ("goals.$"), so project the whole
+        # array and keep its first element matching the filter
+        self._calls.append((self._collection.name, "find_one_and_update"))
+        positional = [key for key in projection or {} if key.endswith(".$")]
+        if not positional:
+            return await self._collection.find_one_and_update(filter, update, projection=projection, **kwargs)
+        field = positional[0][:-2]
+        projection = {**{k: v for k, v in projection.items() if k not in positional}, field: 1}
+        doc = await self._collection.find_one_and_update(filter, update, projection=projection, **kwargs)
+        if doc is not None:
+            conditions = {k[len(field) + 1:]: v for k, v in filter.items() if k.startswith(f"{field}.")}
+            doc[field] = [
+                next(item for item in doc[field] if all(item.get(k) == v for k, v in conditions.items()))
+            ]
+        return doc
+
+
+class MockDb:
+    def __init__(self, db) -> None:
+        self.db = db
+        self.calls: list[tuple[str, str]] = []
+
+    def __getitem__(self, name: str):
+        return self.db[name]
+
+    def count(self, collection: str, method: str | None = None) -> int:
+        return sum(1 for c, m in self.calls if c == collection and method in (None, m))
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def db(monkeypatch):
+    mock = MockDb(AsyncMongoMockClient()["test"])
+    monkeypatch.setattr(mongo, "_db", mock.db)
+    await mongo._ensure_indexes()
+    monkeypatch.setattr(mongo, "get_collection", lambda name: CountingCollection(mock.db[name], mock.calls))
+    yield mock
+    connection_cache._entries.clear()
+    connection_cache.bytes = 0
@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.v1.endpoints import auth
+from app.api.v1.endpoints.auth import RegisterRequest, register
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def fast_hash(monkeypatch):
+    # These tests cover the write path, not bcrypt
+    monkeypatch.setattr(auth, "hash_password", lambda password: f"hashed:{password}")
+
+
+def _request(email: str = "ada@example.com") -> RegisterRequest:
+    return RegisterRequest(email=email, password="correct horse", first_name="Ada", last_name="Lovelace")
+
+
+async def test_register_is_a_single_insert(db):
+    assert await register(_request()) == {"message": "User registered successfully"}
+    assert db.calls == [("users", "insert_one")]
+    assert await db["users"].count_documents({}) == 1
+
+
+async def test_register_duplicate_email_is_rejected_by_the_index(db):
+    await register(_request())
+    with pytest.raises(HTTPException) as exc:
+        await register(_request())
+    assert exc.value.status_code == 400
+    assert exc.value.detail == "Email already registered"
+    assert db.count("users", "find_one") == 0
+
+
+async def test_concurrent_registrations_create_one_user(db):
+    results = await asyncio.gather(*(register(_request()) for _ in range(5)), return_exceptions=True)
+    rejected = [r for r in results if isinstance(r, HTTPException)]
+    assert len(rejected) == 4
+    assert all(r.status_code == 400 for r in rejected)
+    assert await db["users"].count_documents({}) == 1
+    assert db.calls == [("users", "insert_one")] * 5
@@ -0,0 +1,22 @@
+import asyncio
+
+import pytest
+
+from app.db.cache import ConnectionCache
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_cancelled_caller_does_not_fail_other_waiters(db):
+    await db["connections"].insert_one({"user_id": "user-1", "connected": True})
+    cache = ConnectionCache(max_bytes=1 << 20, ttl_seconds=30)
+
+    first = asyncio.create_task(cache.get("user-1"))
+    second = asyncio.create_task(cache.get("user-1"))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert (await second)["connected"] is True
+    assert first.cancelled()
+    assert db.count("connections", "find_one") == 1
+    assert cache.stats()["entries"] == 1
@@ -0,0 +1,77 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app.db.columnar import (
+    COLUMNAR_FIELD,
+    ColumnarTransactions,
+    encode_transactions,
+    load_transactions,
+    transactions_total,
+)
+
+SYNCED_AT = datetime(2030, 1, 15, 12, 30, tzinfo=timezone.utc)
+OPENED_AT = datetime(2030, 1, 2, 8, 0, tzinfo=timezone.utc)
+
+TRANSACTIONS = [
+    {"name": "Kroger", "icon": "cart", "amount": 12.34},
+    {"name": "Shell", "icon": "fuel", "amount": 40.1, "timestamp": OPENED_AT},
+    {"name": "Kroger", "icon": "cart", "amount": 0.29},
+    {"name": "Refund", "amount": -5},
+]
+
+
+def test_encode_dictionary_encodes_names_and_stores_cents():
+    columns = encode_transactions(TRANSACTIONS, SYNCED_AT)
+
+    assert columns["names"] == ["Kroger", "Shell", "Refund"]
+    assert columns["name_ids"] == [0, 1, 0, 2]
+    assert columns["icons"] == ["cart", "fuel"]
+    assert columns["icon_ids"] == [0, 1, 0, None]
+    assert columns["amount_cents"] == [1234, 4010, 29, -500]
+    synced, opened = int(SYNCED_AT.timestamp()), int(OPENED_AT.timestamp())
+    assert columns["ts"] == [synced, opened, synced, synced]
+
+
+def test_rows_round_trip():
+    rows = ColumnarTransactions(encode_transactions(TRANSACTIONS, None))
+
+    assert len(rows) == 4
+    assert list(rows) == [
+        {"name": "Kroger", "icon": "cart", "amount": 12.34},
+        {"name": "Shell", "icon": "fuel", "amount": 40.1, "timestamp": OPENED_AT},
+        {"name": "Kroger", "icon": "cart", "amount": 0.29},
+        {"name": "Refund", "amount": -5},
+    ]
+
+
+def test_indexing_and_slicing():
+    rows = ColumnarTransactions(encode_transactions(TRANSACTIONS, SYNCED_AT))
+
+    assert rows[-1]["name"] == "Refund"
+    assert [row["name"] for row in rows[1:3]] == ["Shell", "Kroger"]
+    assert [row["name"] for row in rows[::-2]] == ["Refund", "Shell"]
+    assert rows[10:] == []
+    with pytest.raises(IndexError):
+        rows[4]
+    with pytest.raises(IndexError):
+        rows[-5]
+
+
+def test_load_transactions_prefers_columnar_storage():
+    legacy = [{"name": "Kroger", "amount": 1.0}]
+    assert load_transactions({"transactions": legacy}) == legacy
+    assert load_transactions({}) == []
+    columnar = load_transactions({"transactions": [], COLUMNAR_FIELD: encode_transactions(legacy, None)})
+    assert isinstance(columnar, ColumnarTransactions)
+    assert list(columnar) == legacy
+
+
+def test_transactions_total_is_exact_in_cents():
+    transactions = [{"name": "Coffee", "amount": 0.1}, {"name": "Tea", "amount": 0.2}] * 5
+    transactions.append({"name": "Unknown", "amount": None})
+
+    assert sum(t["amount"] or 0 for t in transactions) != 1.5
+    assert transactions_total({COLUMNAR_FIELD: encode_transactions(transactions, None)}) == 1.5
+    assert transactions_total({"transactions": [{"amount": 2.5}, {"amount": None}]}) == 2.5
+    assert transactions_total({}) == 0
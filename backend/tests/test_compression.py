@@ -0,0 +1,108 @@
+import pytest
+from fastapi import FastAPI, Response
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core.compression import CompressionMiddleware, negotiate
+
+BODY = b'{"items": [' + b", ".join(b'"item"' for _ in range(400)) + b"]}"
+
+
+@pytest.mark.parametrize(
+    ("header", "expected"),
+    [
+        ("gzip", "gzip"),
+        ("GZIP", "gzip"),
+        ("identity", None),
+        ("gzip;q=0", None),
+        ("gzip;Q=0", None),
+        ("gzip; q=0", None),
+        ("*;q=0", None),
+        ("*", "gzip"),
+        ("gzip;q=bogus", None),
+    ],
+)
+def test_negotiate(header, expected, monkeypatch):
+    monkeypatch.setattr("app.core.compression.ENCODERS", {"gzip": None})
+    assert negotiate(header) == expected
+
+
+def test_negotiate_prefers_highest_q(monkeypatch):
+    monkeypatch.setattr("app.core.compression.ENCODERS", {"br": None, "gzip": None})
+    assert negotiate("gzip, br") == "br"
+    assert negotiate("gzip;q=1, br;q=0.5") == "gzip"
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+
+    @app.get("/json")
+    async def json_body():
+        return Response(BODY, media_type="application/json", headers={"ETag": '"v1"'})
+
+    @app.get("/small")
+    async def small_body():
+        return Response(b'{"ok": true}', media_type="application/json")
+
+    @app.get("/binary")
+    async def binary_body():
+        return Response(BODY, media_type="application/octet-stream")
+
+    @app.get("/missing")
+    async def missing_body():
+        return Response(BODY, status_code=404, media_type="application/json")
+
+    @app.get("/partial")
+    async def partial_body():
+        return Response(
+            BODY[:2048],
+            status_code=206,
+            media_type="application/json",
+            headers={"Content-Range": f"bytes 0-2047/{len(BODY)}"},
+        )
+
+    @app.get("/stream")
+    async def stream_body():
+        async def chunks():
+            yield BODY
+            yield BODY
+
+        return StreamingResponse(chunks(), media_type="application/json")
+
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+    return TestClient(app, headers={"Accept-Encoding": "gzip"})
+
+
+def test_compresses_large_json(client):
+    response = client.get("/json")
+    assert response.headers["content-encoding"] == "gzip"
+    assert int(response.headers["content-length"]) < len(BODY)
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == 'W/"v1"'
+    assert response.headers["server-timing"].startswith("compress;dur=")
+    assert response.content == BODY
+
+
+@pytest.mark.parametrize("path", ["/small", "/binary", "/missing", "/partial", "/stream"])
+def test_passthrough(client, path):
+    response = client.get(path)
+    assert "content-encoding" not in response.headers
+    assert "server-timing" not in response.headers
+
+
+def test_partial_content_is_untouched(client):
+    response = client.get("/partial")
+    assert response.status_code == 206
+    assert response.content == BODY[:2048]
+
+
+def test_streaming_body_is_untouched(client):
+    response = client.get("/stream")
+    assert response.content == BODY + BODY
+
+
+def test_without_accept_encoding(client):
+    response = client.get("/json", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == '"v1"'
@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.v1.endpoints.dashboard import (
+    GoalCreateRequest,
+    GoalUpdateRequest,
+    create_goal,
+    delete_goal,
+    update_goal,
+)
+
+pytestmark = pytest.mark.anyio
+
+USER = {"_id": "user-1"}
+
+
+def _goal(name: str = "Car") -> GoalCreateRequest:
+    return GoalCreateRequest(name=name, date="Jan 2030", monthly=200, total=9600)
+
+
+async def test_create_goal_upserts_the_connection(db):
+    goal = await create_goal(_goal(), USER)
+
+    assert goal["id"]
+    assert db.calls == [("connections", "update_one")]
+    connection = await db["connections"].find_one({"user_id": USER["_id"]})
+    assert connection["connected"] is False
+    assert connection["transactions"] == []
+    assert connection["goals"] == [goal]
+
+
+async def test_create_goal_appends_without_resetting_the_connection(db):
+    await db["connections"].insert_one(
+        {"user_id": USER["_id"], "connected": True, "transactions": [{"name": "Kroger", "amount": 5}], "goals": []}
+    )
+    goal = await create_goal(_goal(), USER)
+
+    connection = await db["connections"].find_one({"user_id": USER["_id"]})
+    assert connection["connected"] is True
+    assert connection["transactions"] == [{"name": "Kroger", "amount": 5}]
+    assert connection["goals"] == [goal]
+
+
+async def test_concurrent_goal_creates_keep_every_goal(db):
+    goals = await asyncio.gather(*(create_goal(_goal(f"Goal {i}"), USER) for i in range(5)))
+
+    connection = await db["connections"].find_one({"user_id": USER["_id"]})
+    assert await db["connections"].count_documents({}) == 1
+    assert sorted(g["name"] for g in connection["goals"]) == sorted(g["name"] for g in goals)
+    assert len({g["id"] for g in connection["goals"]}) == 5
+    assert db.count("connections") == 5
+
+
+async def test_update_goal_sets_only_the_given_fields(db):
+    car = await create_goal(_goal("Car"), USER)
+    house = await create_goal(_goal("House"), USER)
+
+    updated = await update_goal(car["id"], GoalUpdateRequest(monthly=350), USER)
+
+    assert updated == {**car, "monthly": 350}
+    connection = await db["connections"].find_one({"user_id": USER["_id"]})
+    assert connection["goals"] == [updated, house]
+
+
+async def test_update_goal_without_fields_is_rejected(db):
+    car = await create_goal(_goal(), USER)
+    db.calls.clear()
+
+    with pytest.raises(HTTPException) as exc:
+        await update_goal(car["id"], GoalUpdateRequest(), USER)
+
+    assert exc.value.status_code == 400
+    assert db.calls == []
+
+
+async def test_update_unknown_goal_is_not_found(db):
+    await create_goal(_goal(), USER)
+
+    with pytest.raises(HTTPException) as exc:
+        await update_goal("missing", GoalUpdateRequest(name="Boat"), USER)
+
+    assert exc.value.status_code == 404
+
+
+async def test_update_goal_of_another_user_is_not_found(db):
+    car = await create_goal(_goal(), USER)
+
+    with pytest.raises(HTTPException) as exc:
+        await update_goal(car["id"], GoalUpdateRequest(name="Boat"), {"_id": "user-2"})
+
+    assert exc.value.status_code == 404
+    connection = await db["connections"].find_one({"user_id": USER["_id"]})
+    assert connection["goals"] == [car]
+
+
+async def test_delete_goal_pulls_only_that_goal(db):
+    car = await create_goal(_goal("Car"), USER)
+    house = await create_goal(_goal("House"), USER)
+    db.calls.clear()
+
+    assert await delete_goal(car["id"], USER) == {"message": "Goal deleted"}
+
+    assert db.calls == [("connections", "update_one")]
+    connection = await db["connections"].find_one({"user_id": USER["_id"]})
+    assert connection["goals"] == [house]
+
+
+async def test_delete_unknown_goal_is_not_found(db):
+    car = await create_goal(_goal(), USER)
+    await delete_goal(car["id"], USER)
+
+    with pytest.raises(HTTPException) as exc:
+        await delete_goal(car["id"], USER)
+
+    assert exc.value.status_code == 404
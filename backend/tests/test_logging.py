@@ -0,0 +1,50 @@
+import json
+import logging
+import queue
+
+import pytest
+
+from app.core.logging import DroppingQueueHandler, JsonFormatter, TextFormatter
+
+
+@pytest.fixture
+def handler():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=2))
+    logger = logging.getLogger("tests.logging")
+    logger.addHandler(handler)
+    logger.propagate = False
+    yield handler
+    logger.removeHandler(handler)
+    logger.propagate = True
+
+
+def _log_error():
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logging.getLogger("tests.logging").exception("sync %s failed", "plaid")
+
+
+def test_exception_survives_the_queue_as_exc(handler):
+    _log_error()
+    entry = json.loads(JsonFormatter().format(handler.queue.get_nowait()))
+
+    assert entry["msg"] == "sync plaid failed"
+    assert entry["exc"].startswith("Traceback")
+    assert "ValueError: boom" in entry["exc"]
+
+
+def test_text_format_keeps_the_traceback(handler):
+    _log_error()
+    line = TextFormatter("%(levelname)s %(message)s").format(handler.queue.get_nowait())
+
+    assert line.startswith("ERROR sync plaid failed\nTraceback")
+    assert line.count("ValueError: boom") == 1
+
+
+def test_full_queue_drops_and_counts(handler):
+    for _ in range(3):
+        logging.getLogger("tests.logging").warning("hello")
+
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 1
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from app.api.v1.endpoints.plaid import SCENARIOS, plaid_connect, plaid_disconnect
+
+pytestmark = pytest.mark.anyio
+
+USER = {"_id": "user-1", "budget_limit": 3000}
+
+
+async def test_connect_cycles_scenarios(db):
+    names = []
+    for _ in range(len(SCENARIOS) + 1):
+        await plaid_connect(USER)
+        connection = await db["connections"].find_one({"user_id": USER["_id"]})
+        names.append(connection["scenario_name"])
+
+    assert names == [s["name"] for s in SCENARIOS] + [SCENARIOS[0]["name"]]
+
+
+async def test_failed_scenario_write_rolls_back_the_generation(db, monkeypatch):
+    await plaid_connect(USER)
+    before = await db["connections"].find_one({"user_id": USER["_id"]})
+
+    collection_type = type(db["connections"])
+    update_one = collection_type.update_one
+    failed = []
+
+    async def fail_scenario_write(self, query, update, **kwargs):
+        if self.name == "connections" and "$set" in update and not failed:
+            failed.append(query)
+            raise ConnectionError("primary stepped down")
+        return await update_one(self, query, update, **kwargs)
+
+    monkeypatch.setattr(collection_type, "update_one", fail_scenario_write)
+    with pytest.raises(ConnectionError):
+        await plaid_connect(USER)
+
+    after = await db["connections"].find_one({"user_id": USER["_id"]})
+    assert (after["connects"], after["generation"]) == (before["connects"], before["generation"])
+    assert after["scenario_name"] == before["scenario_name"]
+    assert await db["spending_rollups"].count_documents({"generation": after["generation"]}) > 0
+
+
+async def test_concurrent_connects_take_distinct_scenarios_and_keep_the_newest(db):
+    await asyncio.gather(*(plaid_connect(USER) for _ in range(3)))
+
+    connection = await db["connections"].find_one({"user_id": USER["_id"]})
+    assert connection["connects"] == 3
+    assert connection["generation"] == 3
+    assert connection["connected"] is True
+    assert connection["scenario_index"] == 2
+    assert all(goal["id"] for goal in connection["goals"])
+
+    # Rollups describe exactly the stored transactions, once
+    daily = await db["spending_rollups"].find({"granularity": "daily"}).to_list(length=None)
+    assert {b["generation"] for b in daily} == {3}
+    assert sum(b["count"] for b in daily) == len(SCENARIOS[2]["transactions"])
+
+    stats = await db["analytics_user_stats"].find_one({"user_id": USER["_id"]})
+    assert stats["generation"] == 3
+    assert (await db["analytics_global"].find_one({"_id": "global"}))["users"] == 1
+
+
+async def test_disconnect_racing_connect_leaves_no_rollups(db):
+    await plaid_connect(USER)
+    await asyncio.gather(plaid_connect(USER), plaid_disconnect(USER))
+
+    connection = await db["connections"].find_one({"user_id": USER["_id"]})
+    current = await db["spending_rollups"].count_documents(
+        {"user_id": USER["_id"], "generation": connection["generation"]}
+    )
+    if connection["connected"]:
+        assert current > 0
+    else:
+        assert current == 0
+        assert (await db["analytics_global"].find_one({"_id": "global"}))["users"] == 0
@@ -0,0 +1,42 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.testclient import TestClient
+
+from app.core.ratelimit import MemoryRateLimitStore, RateLimitMiddleware, RateLimitStore, parse_rate_limits
+
+pytestmark = pytest.mark.anyio
+
+ORIGIN = "https://app.example.com"
+
+
+def test_store_interface_is_abstract():
+    with pytest.raises(TypeError):
+        RateLimitStore()
+
+
+async def test_memory_store_allows_burst_then_waits():
+    store = MemoryRateLimitStore()
+    assert [await store.take("k", rate=1, burst=2) for _ in range(2)] == [0, 0]
+    assert 0 < await store.take("k", rate=1, burst=2) <= 1
+
+
+def test_rejections_carry_cors_headers():
+    app = FastAPI()
+
+    @app.post("/login")
+    async def login():
+        return {"ok": True}
+
+    # Same order as app.main: the rate limiter is added before (inside) CORS
+    app.add_middleware(
+        RateLimitMiddleware, store=MemoryRateLimitStore(), rules=parse_rate_limits("/login=0.01/1")
+    )
+    app.add_middleware(CORSMiddleware, allow_origins=[ORIGIN], allow_credentials=True)
+
+    client = TestClient(app)
+    assert client.post("/login", headers={"Origin": ORIGIN}).status_code == 200
+    response = client.post("/login", headers={"Origin": ORIGIN})
+    assert response.status_code == 429
+    assert response.headers["retry-after"]
+    assert response.headers["access-control-allow-origin"] == ORIGIN
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core.security import SessionCookieMiddleware, get_current_user
+from app.services.sessions import session_activity
+
+pytestmark = pytest.mark.anyio
+
+USER = {"_id": "user-1"}
+
+
+@pytest.fixture(autouse=True)
+def clear_buffer():
+    yield
+    session_activity._pending.clear()
+
+
+async def _insert_session(db, session_id: str, expires_in: timedelta) -> None:
+    await db["users"].insert_one(dict(USER))
+    await db["sessions"].insert_one(
+        {"session_id": session_id, "user_id": USER["_id"], "expires_at": datetime.now(timezone.utc) + expires_in}
+    )
+    db.calls.clear()
+
+
+async def test_active_session_is_extended_without_writes(db):
+    await _insert_session(db, "s1", timedelta(minutes=5))
+    request = SimpleNamespace(state=SimpleNamespace())
+
+    assert (await get_current_user(request, "s1"))["_id"] == USER["_id"]
+    assert request.state.refresh_session == "s1"
+    assert db.count("sessions") == db.count("sessions", "find_one") == 1
+    assert "s1" in session_activity._pending
+
+    assert await session_activity.flush() == 1
+    stored = await db["sessions"].find_one({"session_id": "s1"})
+    assert stored["expires_at"] > datetime.now() + timedelta(hours=1)
+
+
+async def test_expired_session_is_rejected_and_left_to_the_ttl_index(db):
+    await _insert_session(db, "s2", timedelta(minutes=-1))
+
+    with pytest.raises(HTTPException) as exc:
+        await get_current_user(SimpleNamespace(state=SimpleNamespace()), "s2")
+    # mongomock applies the TTL index on read, so this may surface as "Invalid session"
+    assert exc.value.status_code == 401
+    assert db.calls == [("sessions", "find_one")]
+
+
+def test_refreshed_cookie_reaches_streaming_responses():
+    app = FastAPI()
+
+    def extend(request: Request) -> None:
+        request.state.refresh_session = "s3"
+
+    @app.get("/export", dependencies=[Depends(extend)])
+    async def export():
+        return StreamingResponse(iter([b"a,b\n"]), media_type="text/csv")
+
+    app.add_middleware(SessionCookieMiddleware)
+
+    response = TestClient(app).get("/export")
+    assert response.text == "a,b\n"
+    assert response.cookies["session_id"] == "s3"
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from app.db.cache import connection_cache
+from app.services import transaction_search as search
+from app.services.transaction_search import TransactionIndex, TransactionSearchCache
+
+pytestmark = pytest.mark.anyio
+
+TRANSACTIONS = [
+    {"name": "Starbucks Coffee", "icon": "☕", "amount": 6.5},
+    {"name": "Kroger", "icon": "🛒", "amount": 45.2},
+    {"name": "Café Déjà Vu", "icon": "☕", "amount": 4.0},
+]
+
+
+def test_prefix_accent_and_typo_matching():
+    index = TransactionIndex(TRANSACTIONS)
+    assert [t["name"] for t in index.search("star cof")] == ["Starbucks Coffee"]
+    assert [t["name"] for t in index.search("cafe deja")] == ["Café Déjà Vu"]
+    assert [t["name"] for t in index.search("korger")] == ["Kroger"]
+    assert index.search("   ") == []
+
+
+@pytest.fixture
+async def connection(db):
+    doc = {"user_id": "user-1", "connected": True, "generation": 1, "transactions": TRANSACTIONS}
+    await db["connections"].insert_one(doc)
+    return doc
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    counted = []
+
+    def counting_index(transactions):
+        counted.append(len(transactions))
+        return TransactionIndex(transactions)
+
+    monkeypatch.setattr(search, "TransactionIndex", counting_index)
+    return counted
+
+
+async def test_concurrent_searches_share_one_build(connection, builds):
+    cache = TransactionSearchCache(max_bytes=1 << 20)
+    indexes = await asyncio.gather(*(cache.get("user-1") for _ in range(5)))
+
+    assert builds == [3]
+    assert all(index is indexes[0] for index in indexes)
+    assert await cache.get("user-1") is indexes[0]
+
+
+async def test_index_is_rebuilt_only_when_the_generation_changes(db, connection, builds):
+    cache = TransactionSearchCache(max_bytes=1 << 20)
+    first = await cache.get("user-1")
+
+    # Another worker reconnects: same user, new generation and transactions
+    await db["connections"].update_one(
+        {"user_id": "user-1"}, {"$set": {"generation": 2, "transactions": TRANSACTIONS[:1]}}
+    )
+    assert await cache.get("user-1") is first  # connection still cached here
+    connection_cache.invalidate("user-1")
+
+    second = await cache.get("user-1")
+    assert second is not first
+    assert builds == [3, 1]